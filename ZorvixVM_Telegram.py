@@ -6,18 +6,27 @@ Based on the Discord version, adapted for Telegram's interaction model
 """
 
 import asyncio
-import subprocess
 import json
 from datetime import datetime
 import shlex
 import logging
 import shutil
 import os
-from typing import Optional, Dict, Any, List
-import threading
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
 import time
+import contextlib
+import csv
+import base64
+import struct
+import sqlite3
+from array import array
+from collections import deque
+from enum import StrEnum
+
+import httpx
 
 from telegram import (
+    Message,
     Update,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
@@ -29,7 +38,9 @@ from telegram.ext import (
     CommandHandler,
     CallbackQueryHandler,
     ContextTypes,
-    CallbackContext
+    CallbackContext,
+    MessageHandler,
+    filters
 )
 
 # ============================================================================
@@ -40,9 +51,107 @@ from telegram.ext import (
 TELEGRAM_TOKEN = "YOUR_TELEGRAM_BOT_TOKEN_HERE"
 MAIN_ADMIN_ID = 1352603271285706784
 DEFAULT_STORAGE_POOL = "default"
+
+# Selectable operating systems: key -> display name and "remote:alias" source
+OS_CATALOG = {
+    "ubuntu-22.04": {"name": "Ubuntu 22.04 LTS", "source": "ubuntu:22.04"},
+    "ubuntu-24.04": {"name": "Ubuntu 24.04 LTS", "source": "ubuntu:24.04"},
+    "debian-12": {"name": "Debian 12", "source": "images:debian/12"},
+}
+DEFAULT_OS = "ubuntu-22.04"
+DEFAULT_IMAGE = OS_CATALOG[DEFAULT_OS]["source"]
 CPU_THRESHOLD = 90
 RAM_THRESHOLD = 90
-CHECK_INTERVAL = 600
+CHECK_INTERVAL = 60
+
+# State storage: "sqlite" (row-level, WAL) or "json" (legacy whole-file dumps)
+STORAGE_BACKEND = "sqlite"
+DATABASE_FILE = "zorvix.db"
+PERSIST_INTERVAL = 2.0
+PERSIST_RETRY_MAX = 60
+JOURNAL_FILE = "zorvix.journal"
+JOURNAL_COMPACT_ENTRIES = 500
+JOURNAL_COMPACT_INTERVAL = 300
+MONITOR_CONCURRENCY = 20
+MONITOR_PROBE_TIMEOUT = 15
+
+# Host sampler (/proc)
+HOST_SAMPLE_INTERVAL = 5
+HOST_SAMPLE_WINDOW = 120
+
+# Graduated overload response
+OVERLOAD_RECOVER_THRESHOLD = 75
+OVERLOAD_ESCALATE_AFTER = 2
+OVERLOAD_RECOVER_AFTER = 3
+OVERLOAD_TARGETS = 3
+OVERLOAD_MIN_SHARE = 5
+OVERLOAD_THROTTLE_ALLOWANCE = "50ms/100ms"
+OVERLOAD_THROTTLE_PRIORITY = 0
+# Opt-in: as the last tier, force-stop every instance on the host
+OVERLOAD_FULL_STOP = False
+
+# Per-container metric history and auto-suspend policies
+HISTORY_SAMPLES = 60
+SUSPEND_POLICIES = [
+    {"type": "sustained", "metric": "cpu", "threshold": CPU_THRESHOLD, "hits": 5, "samples": 6},
+    {"type": "sustained", "metric": "ram", "threshold": RAM_THRESHOLD, "hits": 5, "samples": 6},
+    {"type": "percentile", "metric": "cpu", "percentile": 95, "threshold": 85, "window": 600},
+]
+
+# LXD REST API (unix socket)
+LXD_SOCKET_PATH = "/var/snap/lxd/common/lxd/unix.socket"
+LXD_MAX_CONNECTIONS = 10
+LXD_IMAGE_REMOTES = {
+    "ubuntu": "https://cloud-images.ubuntu.com/releases",
+    "images": "https://images.linuxcontainers.org",
+}
+
+# Host-side container metrics (cgroup v2)
+CGROUP_ROOT = "/sys/fs/cgroup"
+CONTAINER_CGROUP_TEMPLATE = "lxc.payload.{name}"
+CPU_SAMPLE_WINDOW = 0.5
+
+# Fleet state snapshot
+FLEET_SNAPSHOT_TTL = 5
+
+# Control panel metrics cache
+METRICS_CACHE_TTL = 30
+
+# Local copies of the OS catalog images, refreshed in the background
+IMAGE_ALIAS_PREFIX = "zorvix-"
+IMAGE_REFRESH_INTERVAL = 6 * 3600
+IMAGE_RETRY_INTERVAL = 60
+
+# Warm pool of stopped, pre-initialized containers for /create
+WARM_POOLS = [
+    {"image": DEFAULT_IMAGE, "storage": DEFAULT_STORAGE_POOL, "size": 2},
+]
+WARM_POOL_PREFIX = "zorvix-warm-"
+WARM_POOL_CONFIG_KEY = "user.zorvix.warm-pool"
+WARM_POOL_CHECK_INTERVAL = 300
+
+# Background jobs for long-running LXC work
+JOB_WORKERS = 4
+JOB_HISTORY = 50
+JOB_PROGRESS_INTERVAL = 2.0
+
+# /create_batch
+BATCH_CONCURRENCY = 4
+BATCH_MAX_INSTANCES = 100
+BATCH_MAX_FILE_SIZE = 256 * 1024
+BATCH_HEADER_FIELDS = {"ram", "cpu", "disk", "storage", "user", "user_id", "os"}
+
+# In-flight creates and reinstalls, resumed or rolled back on startup
+PROVISION_LEDGER_FILE = "zorvix.provisioning.json"
+
+# Reusable tmate sessions for the SSH button
+TMATE_SESSION_TTL = 3600
+TMATE_REAP_INTERVAL = 300
+TMATE_READY_TIMEOUT = 30
+
+# Reinstall by restoring a snapshot taken at provisioning time
+FACTORY_SNAPSHOT = "factory"
+FAST_SNAPSHOT_DRIVERS = ("zfs", "btrfs", "lvm", "ceph")
 
 # Configure logging
 logging.basicConfig(
@@ -60,19 +169,496 @@ if not shutil.which("lxc"):
     logger.error("LXC command not found. Please ensure LXC is installed.")
     raise SystemExit("LXC command not found. Please ensure LXC is installed.")
 
+# ============================================================================
+# INSTANCE RECORDS
+# ============================================================================
+
+class VPSStatus(StrEnum):
+    RUNNING = "running"
+    STOPPED = "stopped"
+    SUSPENDED = "suspended"
+
+def parse_size_mb(value: str) -> int:
+    """'2GB' / '512MB' -> megabytes"""
+    text = str(value).strip().upper()
+    for suffix, factor in (("GB", 1024), ("G", 1024), ("MB", 1), ("M", 1)):
+        if text.endswith(suffix):
+            return int(text[:-len(suffix)]) * factor
+    return int(text) * 1024
+
+def parse_size_gb(value: str) -> int:
+    """'20GB' -> gigabytes"""
+    text = str(value).strip().upper()
+    for suffix in ("GB", "G"):
+        if text.endswith(suffix):
+            return int(text[:-len(suffix)])
+    return int(text)
+
+class VPSRecord:
+    """One instance, with numeric resources and an enum status.
+
+    The stored format is unchanged ("2GB", "1", "20GB" strings) and
+    from_dict()/to_dict() round-trip it, keeping unknown keys in `extra`.
+    Item access (vps['ram'], vps.get(...)) maps onto the fields, so code that
+    only displays a record can keep treating it as the old dict.
+    """
+
+    __slots__ = ('container_name', 'ram_mb', 'cpu_cores', 'storage_gb', 'config', 'status', 'suspended',
+                 'created_at', 'suspension_history', 'shared_with', 'extra', 'source')
+
+    # Keys that are only written back when the source record had them
+    OPTIONAL = ('config', 'created_at', 'suspension_history', 'shared_with')
+    # Stored key -> (parser, field) for the numeric resources
+    RESOURCES = (('ram', parse_size_mb, 'ram_mb'), ('cpu', int, 'cpu_cores'), ('storage', parse_size_gb, 'storage_gb'))
+
+    def __init__(self, container_name: str, ram_mb: int, cpu_cores: int, storage_gb: int,
+                 config: Optional[str] = None, status: Any = VPSStatus.STOPPED, suspended: bool = False,
+                 created_at: Optional[str] = None, suspension_history: Optional[List[Dict]] = None,
+                 shared_with: Optional[List] = None, extra: Optional[Dict[str, Any]] = None,
+                 source: Optional[Dict[str, Any]] = None):
+        self.container_name = container_name
+        self.ram_mb = ram_mb
+        self.cpu_cores = cpu_cores
+        self.storage_gb = storage_gb
+        self.config = config
+        self.status = self._coerce_status(status)
+        self.suspended = suspended
+        self.created_at = created_at
+        self.suspension_history = suspension_history
+        self.shared_with = shared_with
+        self.extra = extra if extra is not None else {}
+        # Stored values of the typed keys, so an unchanged record is written back as it was read
+        self.source = source
+
+    @staticmethod
+    def _coerce_status(status: Any):
+        try:
+            return VPSStatus(status)
+        except ValueError:
+            # Keep statuses written by older code as they are
+            return status
+
+    @property
+    def ram(self) -> str:
+        return f"{self.ram_mb // 1024}GB" if self.ram_mb % 1024 == 0 else f"{self.ram_mb}MB"
+
+    @property
+    def cpu(self) -> str:
+        return str(self.cpu_cores)
+
+    @property
+    def storage(self) -> str:
+        return f"{self.storage_gb}GB"
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'VPSRecord':
+        extra = {k: v for k, v in data.items() if k not in cls.__slots__ + ('ram', 'cpu', 'storage')}
+        parsed = {}
+        for key, parse, field in cls.RESOURCES:
+            try:
+                parsed[field] = parse(data[key])
+            except (KeyError, ValueError, TypeError):
+                parsed[field] = 0
+                if key in data:
+                    extra[key] = data[key]
+        return cls(
+            data['container_name'],
+            status=data.get('status', VPSStatus.STOPPED),
+            suspended=bool(data.get('suspended', False)),
+            extra=extra,
+            source={key: data[key] for key in ('ram', 'cpu', 'storage', 'status', 'suspended') if key in data},
+            **parsed,
+            **{key: data.get(key) for key in cls.OPTIONAL}
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Stored form; keys and types read by from_dict() come back unchanged unless the value changed"""
+        source = self.source
+        data = {'container_name': self.container_name}
+        for key, parse, field in self.RESOURCES:
+            value = getattr(self, field)
+            if source is None or key in source:
+                data[key] = getattr(self, key)
+                if source is not None:
+                    try:
+                        if parse(source[key]) == value:
+                            data[key] = source[key]
+                        elif isinstance(source[key], int) and key == 'cpu':
+                            data[key] = value
+                    except (ValueError, TypeError):
+                        pass
+            elif value:
+                data[key] = getattr(self, key)
+        if source is None or 'status' in source or self.status != VPSStatus.STOPPED:
+            unchanged = source is not None and 'status' in source and self._coerce_status(source['status']) == self.status
+            data['status'] = source['status'] if unchanged else str(self.status)
+        if source is None or 'suspended' in source or self.suspended:
+            unchanged = source is not None and 'suspended' in source and bool(source['suspended']) == self.suspended
+            data['suspended'] = source['suspended'] if unchanged else self.suspended
+        for key in self.OPTIONAL:
+            value = getattr(self, key)
+            if value is not None:
+                data[key] = value
+        data.update(self.extra)
+        return data
+
+    # Dict-style access for display code and the persistence layers
+
+    def __getitem__(self, key: str):
+        if key in self.extra:
+            return self.extra[key]
+        if key in ('ram', 'cpu', 'storage') or key in self.__slots__:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        if key == 'ram':
+            self.ram_mb = parse_size_mb(value)
+        elif key == 'cpu':
+            self.cpu_cores = int(value)
+        elif key == 'storage':
+            self.storage_gb = parse_size_gb(value)
+        elif key == 'status':
+            self.status = self._coerce_status(value)
+        elif key in self.__slots__ and key != 'extra':
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+            return
+        # An unparseable stored value was kept in extra; the typed field replaces it
+        self.extra.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key: str, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, fields: Dict[str, Any] = None, **kwargs):
+        for key, value in {**(fields or {}), **kwargs}.items():
+            self[key] = value
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __repr__(self) -> str:
+        return f"VPSRecord({self.to_dict()!r})"
+
+def as_record(vps) -> VPSRecord:
+    return vps if isinstance(vps, VPSRecord) else VPSRecord.from_dict(vps)
+
 # ============================================================================
 # GLOBAL STATE
 # ============================================================================
 
 class ZorvixHostBot:
+    """Owner of vps_data and admin_data.
+
+    Every change to bot state goes through the mutation methods below. They
+    run on the event loop and never await, so each one is applied atomically
+    with respect to handlers and background tasks. Records are looked up by
+    container name at mutation time, so a record deleted while an LXC call was
+    in flight is simply skipped. Subscribers are notified of every change with
+    (event, payload).
+
+    Because every change passes through here, the owner also keeps the lookup
+    indexes: container name -> (owner, record) and the admin ids as an int
+    set. vps_data itself is already the owner -> records index.
+    """
+
     def __init__(self):
         self.vps_data = {}
         self.admin_data = {"admins": []}
+        self.admin_ids: set = set()
         self.cpu_monitor_active = True
         self.start_time = datetime.now()
+        self._by_name: Dict[str, Tuple[str, Dict]] = {}
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+
+    def replace_state(self, vps_data: Dict[str, List[Dict]], admin_data: Dict[str, List[str]]):
+        """Install freshly loaded state and rebuild the indexes"""
+        self.vps_data = {user_id: [as_record(vps) for vps in vps_list] for user_id, vps_list in vps_data.items()}
+        self.admin_data = admin_data
+        self._by_name = {
+            vps['container_name']: (user_id, vps)
+            for user_id, vps_list in self.vps_data.items()
+            for vps in vps_list
+        }
+        self.admin_ids = {int(admin_id) for admin_id in admin_data.get("admins", []) if str(admin_id).isdigit()}
+
+    def subscribe(self, listener: Callable[[str, Dict[str, Any]], None]):
+        self._listeners.append(listener)
+
+    def _emit(self, event: str, **payload):
+        for listener in self._listeners:
+            try:
+                listener(event, payload)
+            except Exception as e:
+                logger.error(f"State listener failed on {event}: {e}")
+
+    def find_vps(self, container_name: str) -> Optional[Tuple[str, Dict]]:
+        """(owner user_id, record) for a container, or None"""
+        return self._by_name.get(container_name)
+
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self.admin_ids
+
+    def add_vps(self, user_id: str, vps):
+        vps = as_record(vps)
+        self.vps_data.setdefault(user_id, []).append(vps)
+        self._by_name[vps['container_name']] = (user_id, vps)
+        self._emit('create', user_id=user_id, container_name=vps['container_name'], vps=vps)
+
+    def remove_vps(self, container_name: str) -> Optional[Dict]:
+        found = self.find_vps(container_name)
+        if found is None:
+            return None
+        user_id, vps = found
+        self.vps_data[user_id].remove(vps)
+        if not self.vps_data[user_id]:
+            del self.vps_data[user_id]
+        del self._by_name[container_name]
+        self._emit('delete', user_id=user_id, container_name=container_name, vps=vps)
+        return vps
+
+    def set_status(self, container_name: str, status: str, suspended: Optional[bool] = None) -> Optional[Dict]:
+        found = self.find_vps(container_name)
+        if found is None:
+            return None
+        user_id, vps = found
+        old_status = vps.get('status')
+        vps['status'] = status
+        if suspended is not None:
+            vps['suspended'] = suspended
+        self._emit('status', user_id=user_id, container_name=container_name, vps=vps,
+                   old_status=old_status, status=status, suspended=vps.get('suspended', False))
+        return vps
+
+    def update_vps(self, container_name: str, **fields) -> Optional[Dict]:
+        """Replace arbitrary fields of a record (e.g. after a reinstall)"""
+        found = self.find_vps(container_name)
+        if found is None:
+            return None
+        user_id, vps = found
+        vps.update(fields)
+        if vps['container_name'] != container_name:
+            del self._by_name[container_name]
+            self._by_name[vps['container_name']] = (user_id, vps)
+        self._emit('update', user_id=user_id, container_name=container_name, vps=vps, fields=fields)
+        return vps
+
+    def record_history(self, container_name: str, reason: str, by: str, action: Optional[str] = None,
+                       at: Optional[str] = None) -> Optional[Dict]:
+        """Append a suspension_history entry without changing the power state"""
+        found = self.find_vps(container_name)
+        if found is None:
+            return None
+        user_id, vps = found
+        entry = {'time': at or datetime.now().isoformat(), 'reason': reason, 'by': by}
+        if action:
+            entry['action'] = action
+        vps.setdefault('suspension_history', []).append(entry)
+        self._emit('history', user_id=user_id, container_name=container_name, vps=vps, entry=entry)
+        return vps
+
+    def suspend_vps(self, container_name: str, reason: str, by: str, at: Optional[str] = None) -> Optional[Dict]:
+        found = self.find_vps(container_name)
+        if found is None:
+            return None
+        user_id, vps = found
+        vps['status'] = 'suspended'
+        vps['suspended'] = True
+        entry = {'time': at or datetime.now().isoformat(), 'reason': reason, 'by': by}
+        vps.setdefault('suspension_history', []).append(entry)
+        self._emit('suspend', user_id=user_id, container_name=container_name, vps=vps, entry=entry)
+        return vps
+
+    def unsuspend_vps(self, container_name: str) -> Optional[Dict]:
+        found = self.find_vps(container_name)
+        if found is None:
+            return None
+        user_id, vps = found
+        vps['status'] = 'running'
+        vps['suspended'] = False
+        self._emit('unsuspend', user_id=user_id, container_name=container_name, vps=vps)
+        return vps
+
+    def add_admin(self, user_id: str):
+        self.admin_data.setdefault("admins", []).append(user_id)
+        if str(user_id).isdigit():
+            self.admin_ids.add(int(user_id))
+        self._emit('admin_add', user_id=user_id)
+
+    def remove_admin(self, user_id: str):
+        self.admin_data["admins"].remove(user_id)
+        if str(user_id).isdigit():
+            self.admin_ids.discard(int(user_id))
+        self._emit('admin_remove', user_id=user_id)
+
+    def _has_history(self, container_name: str, entry: Dict[str, Any]) -> bool:
+        """Whether a journaled history entry is already in the record.
+
+        With the JSON backend a crash between writing vps_data.json and the
+        seq file leaves a snapshot newer than its recorded seq; appends must
+        not be replayed onto it twice.
+        """
+        found = self.find_vps(container_name)
+        return found is not None and entry in (found[1].get('suspension_history') or [])
+
+    def apply_mutation(self, record: Dict[str, Any]):
+        """Re-apply one journaled mutation (startup replay)"""
+        op = record['op']
+        name = record.get('container_name')
+        if op == 'create':
+            if self.find_vps(name) is None:
+                self.add_vps(record['user_id'], record['vps'])
+        elif op == 'delete':
+            self.remove_vps(name)
+        elif op == 'status':
+            self.set_status(name, record['status'], record.get('suspended'))
+        elif op == 'update':
+            self.update_vps(name, **record['fields'])
+        elif op == 'history':
+            entry = record['entry']
+            if not self._has_history(name, entry):
+                self.record_history(name, entry['reason'], entry['by'], entry.get('action'), at=entry['time'])
+        elif op == 'suspend':
+            entry = record['entry']
+            if self._has_history(name, entry):
+                self.set_status(name, 'suspended', True)
+            else:
+                self.suspend_vps(name, entry['reason'], entry['by'], at=entry['time'])
+        elif op == 'unsuspend':
+            self.unsuspend_vps(name)
+        elif op == 'admin_add':
+            if record['user_id'] not in self.admin_data.get("admins", []):
+                self.add_admin(record['user_id'])
+        elif op == 'admin_remove':
+            if record['user_id'] in self.admin_data.get("admins", []):
+                self.remove_admin(record['user_id'])
+        else:
+            logger.warning(f"Unknown journal op {op!r} at seq {record.get('seq')}")
 
 bot = ZorvixHostBot()
 
+# ============================================================================
+# FLEET AGGREGATES
+# ============================================================================
+
+class FleetTotals:
+    """Summed allocation and state counts for a set of instances"""
+
+    __slots__ = ('instances', 'running', 'suspended', 'ram_mb', 'cpu_cores', 'storage_gb')
+
+    def __init__(self):
+        self.instances = self.running = self.suspended = 0
+        self.ram_mb = self.cpu_cores = self.storage_gb = 0
+
+    def apply(self, vps: VPSRecord, sign: int):
+        self.instances += sign
+        self.ram_mb += sign * vps.ram_mb
+        self.cpu_cores += sign * vps.cpu_cores
+        self.storage_gb += sign * vps.storage_gb
+        if vps.suspended:
+            self.suspended += sign
+        elif vps.status == VPSStatus.RUNNING:
+            self.running += sign
+
+    def as_tuple(self) -> Tuple[int, ...]:
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+def plan_key(vps: VPSRecord) -> str:
+    return f"{vps.ram}/{vps.cpu_cores}C/{vps.storage}"
+
+# Breakdowns kept alongside the fleet totals: name -> key function(owner, record)
+AGGREGATE_DIMENSIONS: Dict[str, Callable[[str, VPSRecord], str]] = {
+    'owner': lambda owner, vps: owner,
+    'plan': lambda owner, vps: plan_key(vps),
+    'host': lambda owner, vps: vps.extra.get('location') or 'local',
+}
+
+class FleetAggregates:
+    """Running totals over bot.vps_data, updated from state-owner events.
+
+    Each instance's last contribution is remembered as a frozen copy of the
+    fields that count, so any event can subtract the old values and add the
+    new ones without scanning the fleet.
+    """
+
+    def __init__(self):
+        self.fleet = FleetTotals()
+        self.by: Dict[str, Dict[str, FleetTotals]] = {name: {} for name in AGGREGATE_DIMENSIONS}
+        self._contrib: Dict[str, Tuple[str, VPSRecord]] = {}
+
+    def _apply(self, owner: str, vps: VPSRecord, sign: int):
+        self.fleet.apply(vps, sign)
+        for name, key_of in AGGREGATE_DIMENSIONS.items():
+            key = key_of(owner, vps)
+            totals = self.by[name].setdefault(key, FleetTotals())
+            totals.apply(vps, sign)
+            if totals.instances == 0:
+                del self.by[name][key]
+
+    def _set(self, container_name: str, owner: Optional[str], vps: Optional[VPSRecord]):
+        previous = self._contrib.pop(container_name, None)
+        if previous is not None:
+            self._apply(*previous, -1)
+        if vps is not None:
+            frozen = VPSRecord(container_name, vps.ram_mb, vps.cpu_cores, vps.storage_gb,
+                               status=vps.status, suspended=vps.suspended,
+                               extra={'location': vps.extra['location']} if 'location' in vps.extra else None)
+            self._contrib[container_name] = (owner, frozen)
+            self._apply(owner, frozen, 1)
+
+    def on_event(self, event: str, payload: Dict[str, Any]):
+        if 'container_name' not in payload:
+            return
+        if event == 'delete':
+            self._set(payload['container_name'], None, None)
+        else:
+            self._set(payload['container_name'], payload['user_id'], payload['vps'])
+
+    def rebuild(self, vps_data: Dict[str, List[VPSRecord]]):
+        self.__init__()
+        for owner, vps_list in vps_data.items():
+            for vps in vps_list:
+                self._set(vps.container_name, owner, vps)
+
+    def owner(self, user_id: str) -> FleetTotals:
+        return self.by['owner'].get(user_id) or FleetTotals()
+
+    def drift(self, vps_data: Dict[str, List[VPSRecord]]) -> List[str]:
+        """Recompute from scratch and describe every total that disagrees"""
+        fresh = FleetAggregates()
+        fresh.rebuild(vps_data)
+        problems = []
+        if fresh.fleet.as_tuple() != self.fleet.as_tuple():
+            problems.append(f"fleet: {self.fleet.as_tuple()} != {fresh.fleet.as_tuple()}")
+        for name in AGGREGATE_DIMENSIONS:
+            for key in self.by[name].keys() | fresh.by[name].keys():
+                ours = self.by[name].get(key, FleetTotals()).as_tuple()
+                theirs = fresh.by[name].get(key, FleetTotals()).as_tuple()
+                if ours != theirs:
+                    problems.append(f"{name} {key}: {ours} != {theirs}")
+        return problems
+
+fleet_totals = FleetAggregates()
+bot.subscribe(fleet_totals.on_event)
+
 # ============================================================================
 # MESSAGE FORMATTING
 # ============================================================================
@@ -82,8 +668,8 @@ def format_bold(text: str) -> str:
     return f"*{text}*"
 
 def format_code(text: str) -> str:
-    """Format text as code in Telegram"""
-    return f"`{text}`"
+    """Format text as code in Telegram (a backtick inside would end the span early)"""
+    return "`" + str(text).replace("`", "'") + "`"
 
 def format_code_block(text: str) -> str:
     """Format text as code block in Telegram"""
@@ -93,6 +679,17 @@ def format_section(title: str, content: str) -> str:
     """Format a section with title"""
     return f"{format_bold(title)}\n{content}"
 
+def format_size(num_bytes: int) -> str:
+    """Format a byte count the way df -h does"""
+    size = float(num_bytes)
+    for unit in ("B", "K", "M", "G", "T"):
+        if size < 1024 or unit == "T":
+            break
+        size /= 1024
+    if unit == "B":
+        return f"{int(size)}B"
+    return f"{size:.1f}{unit}" if size < 10 else f"{size:.0f}{unit}"
+
 def truncate_text(text: str, max_length: int = 4096) -> str:
     """Truncate text to max_length characters"""
     if not text:
@@ -101,6 +698,19 @@ def truncate_text(text: str, max_length: int = 4096) -> str:
         return text
     return text[:max_length-3] + "..."
 
+def split_lines(lines: List[str], max_length: int = 4096) -> List[str]:
+    """Join lines into as few messages as fit, never splitting a line (and its Markdown)"""
+    chunks, current = [], ""
+    for line in lines:
+        line = truncate_text(line, max_length)
+        if current and len(current) + 1 + len(line) > max_length:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
 # ============================================================================
 # DATA MANAGEMENT
 # ============================================================================
@@ -121,15 +731,490 @@ def load_admin_data():
         logger.warning("admin_data.json not found or corrupted, initializing with main admin")
         return {"admins": []}
 
-def save_data():
+INSTANCE_COLUMNS = ('ram', 'cpu', 'storage', 'config', 'status', 'suspended', 'created_at')
+
+class SQLiteStateStore:
+    """Row-level persistence of bot state in SQLite (WAL mode).
+
+    The store subscribes to state-owner events and remembers which rows they
+    touched; journal compaction then writes just those rows in one transaction.
+    On first start it imports the legacy JSON files.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS instances (
+            container_name TEXT PRIMARY KEY,
+            owner_id TEXT NOT NULL REFERENCES users(user_id),
+            ordinal INTEGER NOT NULL,
+            ram TEXT,
+            cpu TEXT,
+            storage TEXT,
+            config TEXT,
+            status TEXT,
+            suspended INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_instances_owner ON instances(owner_id, ordinal);
+        CREATE INDEX IF NOT EXISTS idx_instances_status ON instances(status);
+        CREATE TABLE IF NOT EXISTS admins (
+            user_id TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS suspension_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            container_name TEXT NOT NULL,
+            time TEXT,
+            reason TEXT,
+            by TEXT,
+            action TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_suspension_container ON suspension_events(container_name, id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    UPSERT_INSTANCE = f"""
+        INSERT INTO instances (container_name, owner_id, ordinal, {', '.join(INSTANCE_COLUMNS)}, extra)
+        VALUES (?, ?, (SELECT COALESCE(MAX(ordinal), 0) + 1 FROM instances), {', '.join('?' * len(INSTANCE_COLUMNS))}, ?)
+        ON CONFLICT(container_name) DO UPDATE SET
+            owner_id = excluded.owner_id,
+            {', '.join(f'{c} = excluded.{c}' for c in INSTANCE_COLUMNS)},
+            extra = excluded.extra
+    """
+
+    def __init__(self, path: str = DATABASE_FILE):
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+        # container_name -> (owner, record), or None once deleted
+        self._dirty: Dict[str, Optional[Tuple[str, Dict]]] = {}
+        # Names deleted and created again since the last batch; their old rows go first
+        self._recreated: set = set()
+        self._history: List[Tuple[str, Dict]] = []
+        self._admins: List[Tuple[str, str]] = []
+
+    def open(self):
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(self.SCHEMA)
+
+    def on_event(self, event: str, payload: Dict[str, Any]):
+        if event in ('admin_add', 'admin_remove'):
+            self._admins.append((event, payload['user_id']))
+            return
+        name = payload['container_name']
+        if event == 'delete':
+            self._dirty[name] = None
+            self._history = [(n, entry) for n, entry in self._history if n != name]
+            return
+        if event == 'create' and name in self._dirty and self._dirty[name] is None:
+            self._recreated.add(name)
+        self._dirty[name] = (payload['user_id'], payload['vps'])
+        if event == 'create':
+            for entry in payload['vps'].get('suspension_history', []):
+                self._history.append((name, entry))
+        elif event in ('suspend', 'history'):
+            self._history.append((name, payload['entry']))
+
+    def pending(self) -> bool:
+        return bool(self._dirty or self._history or self._admins)
+
+    def take_batch(self) -> Optional[Dict[str, Any]]:
+        """Detach pending changes as plain row values.
+
+        Runs on the event loop, so records are read while nothing else can
+        mutate them; the returned batch can then be written from any thread.
+        """
+        if not self.pending():
+            return None
+        dirty, recreated, history, admins = self._dirty, self._recreated, self._history, self._admins
+        self._dirty, self._recreated, self._history, self._admins = {}, set(), [], []
+        upserts = []
+        for name, item in dirty.items():
+            if item is None:
+                continue
+            owner_id, vps = item
+            vps = vps.to_dict()
+            extra = {k: v for k, v in vps.items() if k not in INSTANCE_COLUMNS + ('container_name', 'suspension_history')}
+            values = [vps.get(column) for column in INSTANCE_COLUMNS]
+            values[INSTANCE_COLUMNS.index('suspended')] = int(bool(vps.get('suspended', False)))
+            upserts.append((owner_id, [name, owner_id, *values, json.dumps(extra, separators=(',', ':'))]))
+        return {
+            'upserts': upserts,
+            'deletes': [name for name, item in dirty.items() if item is None or name in recreated],
+            'history': [
+                (name, entry.get('time'), entry.get('reason'), entry.get('by'), entry.get('action'))
+                for name, entry in history
+                if dirty.get(name, True) is not None
+            ],
+            'admins': admins,
+            'raw': (dirty, recreated, history, admins)
+        }
+
+    def requeue(self, batch: Dict[str, Any]):
+        """Put a batch that failed to write back in front of newer changes"""
+        dirty, recreated, history, admins = batch['raw']
+        # History of an instance deleted since belongs to nobody now
+        gone = self._recreated | {name for name, item in self._dirty.items() if item is None}
+        self._history = [(name, entry) for name, entry in history if name not in gone] + self._history
+        self._recreated |= recreated
+        dirty.update(self._dirty)
+        self._dirty = dirty
+        self._admins = admins + self._admins
+
+    def write_batch(self, batch: Optional[Dict[str, Any]], journal_seq: Optional[int] = None) -> int:
+        """Write a batch in one transaction and return the payload size in bytes"""
+        if batch is None:
+            batch = {'upserts': [], 'deletes': [], 'history': [], 'admins': []}
+        written = 0
+        with self.conn:
+            if journal_seq is not None:
+                self.conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('journal_seq', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (str(journal_seq),)
+                )
+            for name in batch['deletes']:
+                self.conn.execute("DELETE FROM suspension_events WHERE container_name = ?", (name,))
+                self.conn.execute("DELETE FROM instances WHERE container_name = ?", (name,))
+            for owner_id, row in batch['upserts']:
+                self.conn.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (owner_id,))
+                self.conn.execute(self.UPSERT_INSTANCE, row)
+                written += sum(len(str(value)) for value in row)
+            for row in batch['history']:
+                self.conn.execute(
+                    "INSERT INTO suspension_events (container_name, time, reason, by, action) VALUES (?, ?, ?, ?, ?)",
+                    row
+                )
+                written += sum(len(str(value)) for value in row)
+            for event, user_id in batch['admins']:
+                if event == 'admin_add':
+                    self.conn.execute("INSERT OR IGNORE INTO admins (user_id) VALUES (?)", (user_id,))
+                else:
+                    self.conn.execute("DELETE FROM admins WHERE user_id = ?", (user_id,))
+                written += len(user_id)
+            if batch['deletes']:
+                self.conn.execute("DELETE FROM users WHERE user_id NOT IN (SELECT owner_id FROM instances)")
+        return written
+
+    def flush(self):
+        """Synchronously write every pending change"""
+        batch = self.take_batch()
+        if batch is None:
+            return
+        try:
+            self.write_batch(batch)
+        except Exception:
+            self.requeue(batch)
+            raise
+
+    def journal_seq(self) -> int:
+        """Last journal entry included in the database"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'journal_seq'").fetchone()
+        return int(row[0]) if row else 0
+
+    def load(self) -> Tuple[Dict[str, List[Dict]], Dict[str, List[str]]]:
+        """Rebuild vps_data and admin_data from the database"""
+        history: Dict[str, List[Dict]] = {}
+        for name, when, reason, by, action in self.conn.execute(
+            "SELECT container_name, time, reason, by, action FROM suspension_events ORDER BY container_name, id"
+        ):
+            entry = {'time': when, 'reason': reason, 'by': by}
+            if action:
+                entry['action'] = action
+            history.setdefault(name, []).append(entry)
+
+        vps_data: Dict[str, List[Dict]] = {}
+        for row in self.conn.execute(
+            f"SELECT container_name, owner_id, {', '.join(INSTANCE_COLUMNS)}, extra FROM instances ORDER BY owner_id, ordinal"
+        ):
+            name, owner_id, *values, extra = row
+            vps = {'container_name': name}
+            vps.update(zip(INSTANCE_COLUMNS, values))
+            vps['suspended'] = bool(vps['suspended'])
+            vps['suspension_history'] = history.get(name, [])
+            vps.update(json.loads(extra or '{}'))
+            vps_data.setdefault(owner_id, []).append(vps)
+
+        admins = [user_id for (user_id,) in self.conn.execute("SELECT user_id FROM admins ORDER BY rowid")]
+        return vps_data, {"admins": admins}
+
+    def migrate_from_json(self):
+        """One-time import of vps_data.json / admin_data.json"""
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+        if os.path.exists('vps_data.json') or os.path.exists('admin_data.json'):
+            vps_data = load_vps_data()
+            admin_data = load_admin_data()
+            for user_id, vps_list in vps_data.items():
+                for vps in vps_list:
+                    self.on_event('create', {'user_id': user_id, 'container_name': vps['container_name'], 'vps': as_record(vps)})
+            for admin_id in admin_data.get("admins", []):
+                self.on_event('admin_add', {'user_id': admin_id})
+            logger.info(f"Migrating {sum(len(v) for v in vps_data.values())} instances from JSON to {self.path}")
+        self.flush()
+        with self.conn:
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (datetime.now().isoformat(),))
+
+state_store = SQLiteStateStore()
+
+class MutationJournal:
+    """Append-only log of state-owner mutations, one JSON line per change.
+
+    Every owner event is numbered and buffered here; the persister appends the
+    buffer and fsyncs it once per flush. The snapshot (SQLite or the JSON
+    files) only gets rewritten on compaction and records the last seq it
+    contains. Startup loads the snapshot and replays the newer tail.
+    After compaction the previous segment is kept as <journal>.1.
+    """
+
+    def __init__(self, path: str = JOURNAL_FILE):
+        self.path = path
+        self.seq = 0
+        self.snapshot_seq = 0
+        self.snapshot_time = time.monotonic()
+        self.force_compact = False
+        self._pending: List[str] = []
+
+    def on_event(self, event: str, payload: Dict[str, Any]):
+        self.seq += 1
+        record = {'seq': self.seq, 'time': datetime.now().isoformat(), 'op': event, 'user_id': payload['user_id']}
+        if 'container_name' in payload:
+            record['container_name'] = payload['container_name']
+        if event == 'create':
+            record['vps'] = payload['vps'].to_dict()
+        elif event == 'status':
+            record['status'] = payload['status']
+            record['suspended'] = payload['suspended']
+        elif event == 'update':
+            record['fields'] = payload['fields']
+        elif event in ('history', 'suspend'):
+            record['entry'] = payload['entry']
+        # Serialize now: the record dicts keep changing after the event
+        self._pending.append(json.dumps(record, separators=(',', ':')))
+
+    def take(self) -> Tuple[List[str], int]:
+        lines, self._pending = self._pending, []
+        return lines, self.seq
+
+    def requeue(self, lines: List[str]):
+        self._pending = lines + self._pending
+
+    def entries_since_snapshot(self) -> int:
+        return self.seq - self.snapshot_seq
+
+    def compaction_due(self) -> bool:
+        entries = self.entries_since_snapshot()
+        if self.force_compact:
+            return True
+        return entries > 0 and (
+            entries >= JOURNAL_COMPACT_ENTRIES or time.monotonic() - self.snapshot_time >= JOURNAL_COMPACT_INTERVAL
+        )
+
+    def mark_compacted(self, seq: int):
+        self.snapshot_seq = seq
+        self.snapshot_time = time.monotonic()
+        self.force_compact = False
+
+    def append(self, lines: List[str]) -> int:
+        """Append and fsync a batch of lines (runs in the executor)"""
+        data = ('\n'.join(lines) + '\n').encode()
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(data)
+
+    def rotate(self):
+        """Start a new segment once a snapshot covers the current one"""
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.1")
+
+    def read(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, 'r') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-append; nothing after it was acknowledged
+                    logger.warning(f"Ignoring unreadable journal line {line_no} and the rest of {self.path}")
+                    self.force_compact = True
+                    break
+        return records
+
+    def replay(self, snapshot_seq: int) -> int:
+        """Apply entries newer than the snapshot; returns how many were applied"""
+        self.snapshot_seq = self.seq = snapshot_seq
+        applied = 0
+        for record in self.read():
+            if record['seq'] <= self.seq:
+                continue
+            bot.apply_mutation(record)
+            self.seq = record['seq']
+            applied += 1
+        if applied:
+            self.force_compact = True
+            logger.info(f"Replayed {applied} journal entries after snapshot seq {snapshot_seq}")
+        return applied
+
+journal = MutationJournal()
+
+def read_snapshot_seq() -> int:
+    """Journal seq recorded alongside the JSON snapshot"""
     try:
-        with open('vps_data.json', 'w') as f:
-            json.dump(bot.vps_data, f, indent=4)
-        with open('admin_data.json', 'w') as f:
-            json.dump(bot.admin_data, f, indent=4)
-        logger.info("Data saved successfully")
-    except Exception as e:
-        logger.error(f"Error saving data: {e}")
+        with open(f"{JOURNAL_FILE}.snapshot", 'r') as f:
+            return json.load(f)['seq']
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return 0
+
+def load_state():
+    """Load the latest snapshot from the storage backend and replay the journal tail"""
+    if STORAGE_BACKEND == "sqlite":
+        state_store.open()
+        state_store.migrate_from_json()
+        bot.replace_state(*state_store.load())
+        bot.subscribe(state_store.on_event)
+        snapshot_seq = state_store.journal_seq()
+    else:
+        bot.replace_state(load_vps_data(), load_admin_data())
+        snapshot_seq = read_snapshot_seq()
+    fleet_totals.rebuild(bot.vps_data)
+    journal.replay(snapshot_seq)
+    bot.subscribe(journal.on_event)
+    if journal.force_compact:
+        persister.mark_dirty()
+
+def write_file_atomic(path: str, data: bytes) -> int:
+    """Write via a temp file and rename so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+class WriteBehindPersister:
+    """Coalesces save_data() calls into at most one flush per PERSIST_INTERVAL.
+
+    save_data() only marks state dirty. Each flush appends the new journal
+    entries, and when compaction is due it also writes the snapshot. The state
+    is captured on the event loop and the I/O runs in the default executor.
+    Flush latency and bytes written are kept in `stats`.
+    """
+
+    def __init__(self, interval: float = PERSIST_INTERVAL):
+        self.interval = interval
+        self.dirty = False
+        self.stats = {'flushes': 0, 'errors': 0, 'compactions': 0, 'last_ms': 0.0, 'total_ms': 0.0,
+                      'last_bytes': 0, 'total_bytes': 0}
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._retry_delay = interval
+
+    def mark_dirty(self):
+        self.dirty = True
+        if self._wake is not None:
+            self._wake.set()
+
+    def _snapshot(self):
+        """Capture the snapshot contents; must run on the event loop"""
+        if STORAGE_BACKEND == "sqlite":
+            return state_store.take_batch()
+        return (
+            json.dumps(bot.vps_data, separators=(',', ':'), default=VPSRecord.to_dict).encode(),
+            json.dumps(bot.admin_data, separators=(',', ':')).encode()
+        )
+
+    @staticmethod
+    def _write_snapshot(snapshot, seq: int) -> int:
+        if STORAGE_BACKEND == "sqlite":
+            return state_store.write_batch(snapshot, journal_seq=seq)
+        vps_json, admin_json = snapshot
+        written = write_file_atomic('vps_data.json', vps_json) + write_file_atomic('admin_data.json', admin_json)
+        return written + write_file_atomic(f"{JOURNAL_FILE}.snapshot", json.dumps({'seq': seq}).encode())
+
+    def _write(self, lines: List[str], snapshot, seq: Optional[int]) -> int:
+        written = journal.append(lines) if lines else 0
+        if seq is not None:
+            written += self._write_snapshot(snapshot, seq)
+            journal.rotate()
+        return written
+
+    async def flush(self, compact: bool = False):
+        """Write pending journal entries, compacting when due or when asked to"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self.dirty and not compact:
+                return
+            self.dirty = False
+            lines, seq = journal.take()
+            compact = (compact and journal.entries_since_snapshot() > 0) or journal.compaction_due()
+            snapshot = self._snapshot() if compact else None
+            if not lines and not compact:
+                return
+            started = time.monotonic()
+            try:
+                written = await asyncio.get_running_loop().run_in_executor(
+                    None, self._write, lines, snapshot, seq if compact else None
+                )
+            except Exception as e:
+                # Replay skips entries it has already applied, so re-appending is safe
+                journal.requeue(lines)
+                if STORAGE_BACKEND == "sqlite" and snapshot is not None:
+                    state_store.requeue(snapshot)
+                self.dirty = True
+                self.stats['errors'] += 1
+                logger.error(f"Error saving data: {e}; retrying in {self._retry_delay:.0f}s")
+                # Retry on its own with backoff rather than waiting for the next mutation
+                if self._wake is not None:
+                    asyncio.get_running_loop().call_later(self._retry_delay, self._wake.set)
+                self._retry_delay = min(self._retry_delay * 2, PERSIST_RETRY_MAX)
+                return
+            self._retry_delay = self.interval
+            if compact:
+                journal.mark_compacted(seq)
+                self.stats['compactions'] += 1
+            elapsed_ms = (time.monotonic() - started) * 1000
+            self.stats['flushes'] += 1
+            self.stats['last_ms'] = elapsed_ms
+            self.stats['total_ms'] += elapsed_ms
+            self.stats['last_bytes'] = written
+            self.stats['total_bytes'] += written
+            action = f"compacted at seq {seq}" if compact else f"journaled {len(lines)} entries"
+            logger.info(f"Data saved successfully ({action}, {written} bytes in {elapsed_ms:.1f}ms)")
+
+    async def run(self):
+        """Flush whenever state is dirty, no more than once per interval"""
+        self._wake = asyncio.Event()
+        if self.dirty:
+            self._wake.set()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=JOURNAL_COMPACT_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush(compact=journal.compaction_due())
+            await asyncio.sleep(self.interval)
+
+persister = WriteBehindPersister()
+
+def save_data():
+    """Mark state dirty; the write-behind persister writes it shortly"""
+    persister.mark_dirty()
 
 # ============================================================================
 # PERMISSION CHECKS
@@ -137,20 +1222,375 @@ def save_data():
 
 def is_admin(user_id: int) -> bool:
     """Check if user is an admin"""
-    return user_id == MAIN_ADMIN_ID or str(user_id) in bot.admin_data.get("admins", [])
+    return user_id == MAIN_ADMIN_ID or bot.is_admin(user_id)
 
 def is_main_admin(user_id: int) -> bool:
     """Check if user is the main admin"""
     return user_id == MAIN_ADMIN_ID
 
+# ============================================================================
+# LXD API CLIENT
+# ============================================================================
+
+class LXDError(Exception):
+    """Error reported by the LXD API"""
+
+def is_fingerprint(image: str) -> bool:
+    return len(image) == 64 and all(c in '0123456789abcdef' for c in image)
+
+class LXDClient:
+    """Async client for the LXD REST API over the local unix socket.
+
+    Requests share a pool of keep-alive connections instead of paying for a
+    fresh `lxc` process each time. Background operations are awaited through
+    the /1.0/events stream when watch_operations() is running, and through
+    the /wait long-poll endpoint otherwise.
+    """
+
+    def __init__(self, socket_path: str = LXD_SOCKET_PATH):
+        self.socket_path = socket_path
+        self._client: Optional[httpx.AsyncClient] = None
+        self._op_waiters: Dict[str, asyncio.Future] = {}
+        self._events_connected = False
+        self._extensions: Optional[set] = None
+
+    def available(self) -> bool:
+        return os.path.exists(self.socket_path)
+
+    async def has_extension(self, extension: str) -> bool:
+        """Whether the server advertises an API extension (fetched once)"""
+        if self._extensions is None:
+            server = await self.request('GET', "/1.0")
+            self._extensions = set(server.get('api_extensions', []))
+        return extension in self._extensions
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=LXD_MAX_CONNECTIONS,
+                max_keepalive_connections=LXD_MAX_CONNECTIONS
+            )
+            self._client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=self.socket_path, limits=limits),
+                base_url="http://lxd",
+                timeout=120
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, path: str, body: Optional[Dict] = None, timeout: float = 120) -> Any:
+        """Send a request and return its metadata, waiting for background operations"""
+        response = await self._http().request(method, path, json=body, timeout=timeout)
+        data = response.json()
+        if data.get('type') == 'error':
+            raise LXDError(data.get('error') or f"LXD returned HTTP {response.status_code}")
+        if data.get('type') == 'async':
+            return await self.wait_operation(data['metadata']['id'], timeout)
+        return data.get('metadata')
+
+    async def request_raw(self, method: str, path: str, timeout: float = 120) -> bytes:
+        """Send a request whose response body is not an LXD JSON envelope"""
+        response = await self._http().request(method, path, timeout=timeout)
+        if response.status_code >= 400:
+            raise LXDError(f"LXD returned HTTP {response.status_code} for {path}")
+        return response.content
+
+    async def wait_operation(self, operation_id: str, timeout: float = 120) -> Dict[str, Any]:
+        """Wait for a background operation to finish and return its metadata"""
+        operation = None
+        if self._events_connected:
+            deadline = time.monotonic() + timeout
+            future = asyncio.get_running_loop().create_future()
+            self._op_waiters[operation_id] = future
+            try:
+                # The operation may have finished before the waiter was registered
+                operation = await self.request('GET', f"/1.0/operations/{operation_id}")
+                if operation['status_code'] < 200:
+                    # None means the event stream dropped; ask LXD directly below
+                    operation = await asyncio.wait_for(future, timeout)
+            finally:
+                self._op_waiters.pop(operation_id, None)
+            timeout = max(1, deadline - time.monotonic())
+        if operation is None:
+            operation = await self.request(
+                'GET', f"/1.0/operations/{operation_id}/wait?timeout={int(timeout)}", timeout=timeout + 5
+            )
+        if operation['status_code'] != 200:
+            raise LXDError(operation.get('err') or f"Operation {operation['status'].lower()}")
+        return operation
+
+    async def events(self, event_types: str = "operation", on_connect=None):
+        """Yield events from the /1.0/events websocket"""
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        try:
+            key = base64.b64encode(os.urandom(16)).decode()
+            writer.write(
+                f"GET /1.0/events?type={event_types} HTTP/1.1\r\n"
+                f"Host: lxd\r\n"
+                f"Upgrade: websocket\r\n"
+                f"Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                f"Sec-WebSocket-Version: 13\r\n\r\n".encode()
+            )
+            await writer.drain()
+            status_line = await reader.readline()
+            if b" 101 " not in status_line:
+                raise LXDError(f"Event stream refused: {status_line.decode().strip()}")
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+            if on_connect:
+                # May be a coroutine; events arriving meanwhile queue on the socket
+                result = on_connect()
+                if asyncio.iscoroutine(result):
+                    await result
+
+            message = b""
+            while True:
+                fin, opcode, payload = await _read_ws_frame(reader)
+                if opcode == 0x8:
+                    return
+                if opcode == 0x9:
+                    writer.write(_ws_frame(0xA, payload))
+                    await writer.drain()
+                    continue
+                if opcode in (0x0, 0x1, 0x2):
+                    message += payload
+                    if fin:
+                        yield json.loads(message)
+                        message = b""
+        finally:
+            writer.close()
+
+    def _mark_events_connected(self):
+        self._events_connected = True
+
+    async def watch_operations(self):
+        """Resolve operation waiters from the event stream, reconnecting on failure"""
+        while True:
+            try:
+                async for event in self.events("operation", on_connect=self._mark_events_connected):
+                    metadata = event.get('metadata') or {}
+                    waiter = self._op_waiters.get(metadata.get('id'))
+                    if waiter and not waiter.done() and metadata.get('status_code', 0) >= 200:
+                        waiter.set_result(metadata)
+            except Exception as e:
+                logger.warning(f"LXD event stream lost: {e}")
+            self._events_connected = False
+            # Their completion events may never arrive; send the waiters to /wait instead
+            for waiter in self._op_waiters.values():
+                if not waiter.done():
+                    waiter.set_result(None)
+            await asyncio.sleep(5)
+
+    # Instance operations
+
+    async def set_state(self, name: str, action: str, force: bool = False, timeout: float = 120):
+        await self.request('PUT', f"/1.0/instances/{name}/state", {
+            'action': action,
+            'timeout': -1,
+            'force': force
+        }, timeout=timeout)
+
+    async def delete(self, name: str, force: bool = False, timeout: float = 120):
+        if force:
+            instance = await self.request('GET', f"/1.0/instances/{name}")
+            if instance.get('status') != 'Stopped':
+                await self.set_state(name, 'stop', force=True, timeout=timeout)
+        await self.request('DELETE', f"/1.0/instances/{name}", timeout=timeout)
+
+    @staticmethod
+    def _image_source(image: str) -> Dict[str, Any]:
+        """Instance source for a "remote:alias" image or a local fingerprint"""
+        remote, _, alias = image.rpartition(":")
+        if not remote and is_fingerprint(alias):
+            return {'type': 'image', 'fingerprint': alias}
+        source: Dict[str, Any] = {'type': 'image', 'alias': alias}
+        if remote:
+            if remote not in LXD_IMAGE_REMOTES:
+                raise LXDError(f"Unknown image remote: {remote}")
+            source.update({
+                'server': LXD_IMAGE_REMOTES[remote],
+                'protocol': 'simplestreams',
+                'mode': 'pull'
+            })
+        return source
+
+    async def init(self, name: str, image: str, storage_pool: str, timeout: float = 120):
+        """Create an instance from a "remote:alias" image without starting it"""
+        await self.request('POST', "/1.0/instances", {
+            'name': name,
+            'type': 'container',
+            'source': self._image_source(image),
+            'devices': {'root': {'type': 'disk', 'path': '/', 'pool': storage_pool}}
+        }, timeout=timeout)
+
+    async def launch(self, name: str, image: str, profiles: List[str], config: Optional[Dict[str, str]] = None,
+                     timeout: float = 300, start: bool = True):
+        """Create and start an instance from profiles in one request.
+
+        Servers without the instance_create_start extension need a separate
+        start call. With start=False the instance is only created.
+        """
+        start_in_create = start and await self.has_extension('instance_create_start')
+        await self.request('POST', "/1.0/instances", {
+            'name': name,
+            'type': 'container',
+            'source': self._image_source(image),
+            'profiles': profiles,
+            'config': config or {},
+            'start': start_in_create
+        }, timeout=timeout)
+        if start and not start_in_create:
+            await self.set_state(name, 'start')
+
+    async def get_profile(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.request('GET', f"/1.0/profiles/{name}")
+        except LXDError:
+            return None
+
+    async def create_profile(self, name: str, config: Dict[str, str], devices: Dict[str, Dict[str, str]],
+                             description: str = ""):
+        await self.request('POST', "/1.0/profiles", {
+            'name': name,
+            'config': config,
+            'devices': devices,
+            'description': description
+        })
+
+    async def snapshot(self, name: str, snapshot: str):
+        await self.request('POST', f"/1.0/instances/{name}/snapshots", {'name': snapshot})
+
+    async def restore(self, name: str, snapshot: str):
+        await self.request('PUT', f"/1.0/instances/{name}", {'restore': snapshot})
+
+    async def rename(self, name: str, new_name: str):
+        await self.request('POST', f"/1.0/instances/{name}", {'name': new_name})
+
+    async def set_config(self, name: str, key: str, value: str):
+        await self.request('PATCH', f"/1.0/instances/{name}", {'config': {key: value}})
+
+    async def unset_config(self, name: str, key: str):
+        # PATCH merges config, so removing a key takes a full PUT
+        instance = await self.request('GET', f"/1.0/instances/{name}")
+        config = dict(instance.get('config') or {})
+        if config.pop(key, None) is None:
+            return
+        instance['config'] = config
+        await self.request('PUT', f"/1.0/instances/{name}", instance)
+
+    async def set_device(self, name: str, device: str, key: str, value: str):
+        instance = await self.request('GET', f"/1.0/instances/{name}")
+        config = dict(instance.get('devices', {}).get(device) or instance['expanded_devices'][device])
+        config[key] = value
+        await self.request('PATCH', f"/1.0/instances/{name}", {'devices': {device: config}})
+
+    async def exec(self, name: str, command: List[str], timeout: float = 120) -> Tuple[int, str, str]:
+        """Run a command in the instance and return (exit code, stdout, stderr)"""
+        operation = await self.request('POST', f"/1.0/instances/{name}/exec", {
+            'command': command,
+            'wait-for-websocket': False,
+            'interactive': False,
+            'record-output': True
+        }, timeout=timeout)
+        result = operation.get('metadata') or {}
+        output = {}
+        for fd, log_path in (result.get('output') or {}).items():
+            output[fd] = (await self.request_raw('GET', log_path)).decode(errors='replace')
+            await self.request_raw('DELETE', log_path)
+        return result.get('return', -1), output.get('1', ''), output.get('2', '')
+
+async def _read_ws_frame(reader: asyncio.StreamReader) -> Tuple[bool, int, bytes]:
+    """Read one websocket frame and return (fin, opcode, payload)"""
+    head = await reader.readexactly(2)
+    fin = bool(head[0] & 0x80)
+    opcode = head[0] & 0x0F
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if head[1] & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return fin, opcode, payload
+
+def _ws_frame(opcode: int, payload: bytes) -> bytes:
+    """Build a masked client-to-server websocket frame"""
+    mask = os.urandom(4)
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, 0x80 | length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+    return header + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+lxd = LXDClient()
+
 # ============================================================================
 # LXC COMMAND EXECUTION
 # ============================================================================
 
+def _lxc_api_call(cmd: List[str]):
+    """Map an `lxc ...` command line onto the equivalent API call, if there is one"""
+    if len(cmd) > 4 and cmd[1] == 'exec' and cmd[3] == '--':
+        async def run():
+            code, stdout, stderr = await lxd.exec(cmd[2], cmd[4:])
+            if code != 0:
+                raise Exception(stderr.strip() or "Command execution failed")
+            return stdout.strip() or "Success"
+        return run
+
+    args = [arg for arg in cmd[1:] if arg != '--force']
+    force = '--force' in cmd
+    verb = args[0] if args else ''
+    if any(arg.startswith('-') and arg != '--storage' for arg in args):
+        return None
+
+    if verb in ('start', 'stop', 'restart') and len(args) == 2:
+        return lambda: lxd.set_state(args[1], verb, force=force)
+    if verb == 'delete' and len(args) == 2:
+        return lambda: lxd.delete(args[1], force=force)
+    if verb == 'init' and len(args) == 5 and args[3] == '--storage':
+        return lambda: lxd.init(args[2], args[1], args[4])
+    if verb == 'move' and len(args) == 3:
+        return lambda: lxd.rename(args[1], args[2])
+    if verb == 'snapshot' and len(args) == 3:
+        return lambda: lxd.snapshot(args[1], args[2])
+    if verb == 'restore' and len(args) == 3:
+        return lambda: lxd.restore(args[1], args[2])
+    if verb == 'config' and len(args) == 5 and args[1] == 'set':
+        return lambda: lxd.set_config(args[2], args[3], args[4])
+    if verb == 'config' and len(args) == 4 and args[1] == 'unset':
+        return lambda: lxd.unset_config(args[2], args[3])
+    if verb == 'config' and len(args) == 7 and args[1:3] == ['device', 'set']:
+        return lambda: lxd.set_device(args[3], args[4], args[5], args[6])
+    if verb == 'query' and len(args) == 2:
+        async def query():
+            return json.dumps(await lxd.request('GET', args[1]))
+        return query
+    return None
+
 async def execute_lxc(command: str, timeout: int = 120) -> str:
-    """Execute LXC command with timeout and error handling"""
+    """Execute LXC command with timeout and error handling.
+
+    Commands with an API equivalent go over the LXD socket; anything else
+    (or a host without the socket) falls back to the lxc CLI.
+    """
     try:
         cmd = shlex.split(command)
+        api_call = _lxc_api_call(cmd) if lxd.available() else None
+        if api_call is not None:
+            result = await asyncio.wait_for(api_call(), timeout=timeout)
+            return result if isinstance(result, str) else "Success"
+
         proc = await asyncio.create_subprocess_exec(
             *cmd,
             stdout=asyncio.subprocess.PIPE,
@@ -170,217 +1610,2166 @@ async def execute_lxc(command: str, timeout: int = 120) -> str:
         logger.error(f"LXC Error: {command} - {str(e)}")
         raise
 
+async def exec_in_container(container_name: str, command: List[str], timeout: int = 120) -> Tuple[int, str, str]:
+    """Run a command inside a container and return (exit code, stdout, stderr)"""
+    if lxd.available():
+        return await asyncio.wait_for(lxd.exec(container_name, command, timeout=timeout), timeout=timeout)
+    proc = await asyncio.create_subprocess_exec(
+        "lxc", "exec", container_name, "--", *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    return proc.returncode, stdout.decode(), stderr.decode()
+
 # ============================================================================
-# HOST MONITORING SYSTEM
+# CONTAINER OPERATION LOCKS
 # ============================================================================
 
-def get_cpu_usage() -> float:
-    """Get current CPU usage percentage"""
-    try:
-        result = subprocess.run(['top', '-bn1'], capture_output=True, text=True)
-        output = result.stdout
-        
-        for line in output.split('\n'):
-            if '%Cpu(s):' in line:
-                words = line.split()
-                for i, word in enumerate(words):
-                    if word == 'id,':
-                        idle_str = words[i-1].rstrip(',')
-                        try:
-                            idle = float(idle_str)
-                            usage = 100.0 - idle
-                            return usage
-                        except ValueError:
-                            pass
-                break
-        return 0.0
-    except Exception as e:
-        logger.error(f"Error getting CPU usage: {e}")
-        return 0.0
+class OperationInProgress(Exception):
+    """A different operation is already running on the container"""
 
-def cpu_monitor():
-    """Monitor CPU usage and stop all VPS if threshold is exceeded"""
-    while bot.cpu_monitor_active:
+    def __init__(self, container_name: str, operation: str):
+        super().__init__(f"{operation} already in progress on {container_name}")
+        self.container_name = container_name
+        self.operation = operation
+
+class ContainerOperations:
+    """Per-container single-flight lock for LXC actions.
+
+    A request for the operation already running on a container joins it and
+    gets the same result instead of starting a duplicate. A different
+    operation is rejected with OperationInProgress, or with wait=True it
+    queues until the container is free. The running operation keeps going if
+    a caller is cancelled.
+    """
+
+    def __init__(self):
+        self._active: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    def current(self, container_name: str) -> Optional[Tuple[str, float]]:
+        """(operation, seconds running) for a container, or None when idle"""
+        active = self._active.get(container_name)
+        if active is None:
+            return None
+        return active['op'], time.monotonic() - active['started']
+
+    async def run(self, container_name: str, op: str, action: Callable[[], Awaitable], wait: bool = False):
+        active = self._active.get(container_name)
+        if active is not None:
+            if active['op'] == op:
+                logger.info(f"Joining in-flight {op} on {container_name}")
+                return await asyncio.shield(active['task'])
+            if not wait:
+                raise OperationInProgress(container_name, active['op'])
+        self._users[container_name] = self._users.get(container_name, 0) + 1
+        task = asyncio.ensure_future(self._execute(container_name, op, action))
+        # Claim the container now so requests arriving before the task starts can join it
+        self._active.setdefault(container_name, {'op': op, 'task': task, 'started': time.monotonic()})
+        return await asyncio.shield(task)
+
+    async def _execute(self, container_name: str, op: str, action: Callable[[], Awaitable]):
+        lock = self._locks.setdefault(container_name, asyncio.Lock())
         try:
-            cpu_usage = get_cpu_usage()
-            logger.info(f"Current CPU usage: {cpu_usage}%")
-            
-            if cpu_usage > CPU_THRESHOLD:
-                logger.warning(f"CPU usage ({cpu_usage}%) exceeded threshold ({CPU_THRESHOLD}%). Initiating emergency shutdown.")
-                
+            async with lock:
+                task = asyncio.current_task()
+                self._active[container_name] = {'op': op, 'task': task, 'started': time.monotonic()}
                 try:
-                    subprocess.run(['lxc', 'stop', '--all', '--force'], check=True)
-                    logger.info("All instances powered down due to critical resource levels")
-                    
-                    for user_id, vps_list in bot.vps_data.items():
-                        for vps in vps_list:
-                            if vps.get('status') == 'running':
-                                vps['status'] = 'stopped'
-                    save_data()
-                except Exception as e:
-                    logger.error(f"Error during emergency shutdown: {e}")
-            
-            time.sleep(60)
-        except Exception as e:
-            logger.error(f"Error in CPU monitor: {e}")
-            time.sleep(60)
+                    return await action()
+                finally:
+                    if self._active.get(container_name, {}).get('task') is task:
+                        del self._active[container_name]
+        finally:
+            self._users[container_name] -= 1
+            if not self._users[container_name]:
+                del self._users[container_name]
+                del self._locks[container_name]
+
+container_ops = ContainerOperations()
 
 # ============================================================================
-# CONTAINER STATISTICS
+# HOST MONITORING SYSTEM
 # ============================================================================
 
-async def get_container_status(container_name: str) -> str:
-    """Get the status of the LXC container"""
+def read_meminfo() -> Dict[str, int]:
+    """Parse /proc/meminfo into bytes"""
+    values = {}
+    with open('/proc/meminfo', 'r') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            parts = rest.split()
+            if parts:
+                values[key] = int(parts[0]) * (1024 if len(parts) > 1 else 1)
+    return values
+
+def read_pressure(resource: str) -> Optional[float]:
+    """"some avg10" from /proc/pressure/<resource>, or None without PSI support"""
     try:
-        proc = await asyncio.create_subprocess_exec(
-            "lxc", "info", container_name,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, _ = await proc.communicate()
-        output = stdout.decode()
-        for line in output.splitlines():
-            if line.startswith("Status: "):
-                return line.split(": ", 1)[1].strip()
-        return "Unknown"
-    except Exception:
-        return "Unknown"
+        with open(f'/proc/pressure/{resource}', 'r') as f:
+            for line in f:
+                if line.startswith('some '):
+                    for field in line.split()[1:]:
+                        key, _, value = field.partition('=')
+                        if key == 'avg10':
+                            return float(value)
+    except OSError:
+        pass
+    return None
+
+class HostSampler:
+    """Host CPU, memory, load and pressure sampled from /proc without subprocesses.
+
+    CPU usage is the delta of /proc/stat counters between consecutive samples,
+    so its resolution is HOST_SAMPLE_INTERVAL. The last HOST_SAMPLE_WINDOW
+    samples are kept for averaging.
+    """
+
+    def __init__(self, window: int = HOST_SAMPLE_WINDOW):
+        self.samples = deque(maxlen=window)
+        self._prev_cpu: Optional[Tuple[int, int]] = None
+
+    @staticmethod
+    def _read_cpu_counters() -> Tuple[int, int]:
+        """(busy, total) jiffies from the aggregate cpu line of /proc/stat"""
+        with open('/proc/stat', 'r') as f:
+            fields = [int(v) for v in f.readline().split()[1:9]]
+        # user nice system idle iowait irq softirq steal; guest time is already in user
+        idle = fields[3] + fields[4]
+        total = sum(fields)
+        return total - idle, total
+
+    def sample(self) -> Optional[Dict[str, Any]]:
+        """Take a sample; the first call only primes the CPU counters"""
+        busy, total = self._read_cpu_counters()
+        prev = self._prev_cpu
+        self._prev_cpu = (busy, total)
+        if prev is None or total <= prev[1]:
+            return None
+
+        meminfo = read_meminfo()
+        with open('/proc/loadavg', 'r') as f:
+            load = tuple(float(v) for v in f.read().split()[:3])
+        mem_total = meminfo.get('MemTotal', 0)
+        sample = {
+            'time': time.time(),
+            'cpu_pct': (busy - prev[0]) / (total - prev[1]) * 100,
+            'mem_total': mem_total,
+            'mem_used': mem_total - meminfo.get('MemAvailable', meminfo.get('MemFree', 0)),
+            'load': load,
+            'psi': {resource: read_pressure(resource) for resource in ('cpu', 'memory', 'io')}
+        }
+        self.samples.append(sample)
+        return sample
+
+    def window(self, seconds: float) -> List[Dict[str, Any]]:
+        cutoff = time.time() - seconds
+        return [sample for sample in self.samples if sample['time'] >= cutoff]
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        return self.samples[-1] if self.samples else None
+
+    def cpu_average(self, seconds: float) -> float:
+        """Mean host CPU usage over the last `seconds`"""
+        samples = self.window(seconds)
+        if not samples:
+            return 0.0
+        return sum(sample['cpu_pct'] for sample in samples) / len(samples)
+
+host_sampler = HostSampler()
+
+async def host_sampler_loop():
+    """Feed the host sampler every HOST_SAMPLE_INTERVAL seconds"""
+    while True:
+        try:
+            host_sampler.sample()
+        except Exception as e:
+            logger.error(f"Host sampler error: {e}")
+        await asyncio.sleep(HOST_SAMPLE_INTERVAL)
+
+def get_cpu_usage() -> float:
+    """Get host CPU usage percentage averaged over the last minute"""
+    return host_sampler.cpu_average(60)
+
+async def cpu_monitor():
+    """Monitor host CPU/RAM and hand overload decisions to the response engine"""
+    while bot.cpu_monitor_active:
+        try:
+            cpu_usage = get_cpu_usage()
+            host = host_sampler.latest()
+            mem_pct = host['mem_used'] / host['mem_total'] * 100 if host and host['mem_total'] else 0.0
+            logger.info(f"Current CPU usage: {cpu_usage:.1f}%, memory: {mem_pct:.1f}%")
+            
+            await overload_responder.evaluate(cpu_usage, mem_pct)
+            
+            await asyncio.sleep(60)
+        except Exception as e:
+            logger.error(f"Error in CPU monitor: {e}")
+            await asyncio.sleep(60)
+
+# ============================================================================
+# OVERLOAD RESPONSE ENGINE
+# ============================================================================
+
+OVERLOAD_TIERS = ["normal", "throttle", "freeze", "stop", "stop_all"]
+
+async def set_container_state(container_name: str, action: str):
+    """Change an instance's power state (start/stop/freeze/unfreeze)"""
+    if lxd.available():
+        await lxd.set_state(container_name, action)
+    else:
+        verb = {"freeze": "pause", "unfreeze": "start"}.get(action, action)
+        await execute_lxc(f"lxc {verb} {container_name}")
+
+class OverloadResponder:
+    """Tiered response to host overload.
+
+    While the host stays above CPU_THRESHOLD / RAM_THRESHOLD the engine moves
+    up one tier every OVERLOAD_ESCALATE_AFTER checks: throttle the heaviest
+    containers, then freeze them, then stop them, and only as the final tier
+    stop every instance on the host. It steps back down one tier after
+    OVERLOAD_RECOVER_AFTER consecutive checks below
+    OVERLOAD_RECOVER_THRESHOLD; checks in between hold the current tier.
+    Stopped containers stay suspended for an administrator to review.
+    """
+
+    def __init__(self):
+        self.tier = 0
+        self.hot_checks = 0
+        self.calm_checks = 0
+        # container_name -> vps record of containers the engine has acted on
+        self.offenders: Dict[str, Dict] = {}
+        self.throttled = set()
+        self.frozen = set()
+
+    async def rank_consumers(self, resource: str) -> List[Tuple[float, Dict]]:
+        """Running containers ordered by their share (%) of host CPU or memory"""
+        candidates = [
+            vps
+            for vps_list in bot.vps_data.values()
+            for vps in vps_list
+            if vps.get('status') == 'running' and not vps.get('suspended', False)
+        ]
+        host_cpus = os.cpu_count() or 1
+        host_memory = get_host_memory_total()
+
+        async def measure(vps: Dict) -> Tuple[float, Dict]:
+            name = vps['container_name']
+            if resource == 'memory':
+                memory = metrics_collector.memory(name)
+                share = memory[0] / host_memory * 100 if memory and host_memory else 0.0
+            else:
+                cpu_pct = await metrics_collector.cpu_pct(name)
+                share = cpu_pct * metrics_collector.cpu_count(name) / host_cpus
+            return share, vps
+
+        shares = await asyncio.gather(*(measure(vps) for vps in candidates))
+        ranked = [item for item in shares if item[0] >= OVERLOAD_MIN_SHARE]
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return ranked
+
+    async def evaluate(self, cpu_usage: float, mem_pct: float):
+        overloaded = cpu_usage > CPU_THRESHOLD or mem_pct > RAM_THRESHOLD
+        calm = cpu_usage < OVERLOAD_RECOVER_THRESHOLD and mem_pct < OVERLOAD_RECOVER_THRESHOLD
+
+        if overloaded:
+            self.calm_checks = 0
+            self.hot_checks += 1
+            if self.tier == 0 or self.hot_checks >= OVERLOAD_ESCALATE_AFTER:
+                self.hot_checks = 0
+                resource = 'memory' if mem_pct > RAM_THRESHOLD and cpu_usage <= CPU_THRESHOLD else 'cpu'
+                reason = f"Host overload: CPU {cpu_usage:.1f}%, memory {mem_pct:.1f}%"
+                await self.escalate(resource, reason)
+        elif calm and self.tier > 0:
+            self.hot_checks = 0
+            self.calm_checks += 1
+            if self.calm_checks >= OVERLOAD_RECOVER_AFTER:
+                self.calm_checks = 0
+                await self.relax()
+        else:
+            # Inside the hysteresis band: hold the current tier
+            self.hot_checks = 0
+            self.calm_checks = 0
+
+    async def escalate(self, resource: str, reason: str):
+        max_tier = len(OVERLOAD_TIERS) - 1 if OVERLOAD_FULL_STOP else len(OVERLOAD_TIERS) - 2
+        self.tier = min(self.tier + 1, max_tier)
+        tier_name = OVERLOAD_TIERS[self.tier]
+        logger.warning(f"{reason}. Escalating overload response to tier {self.tier} ({tier_name})")
+
+        if tier_name == "stop_all":
+            await self.stop_all(reason)
+            return
+
+        for share, vps in (await self.rank_consumers(resource))[:OVERLOAD_TARGETS]:
+            self.offenders.setdefault(vps['container_name'], vps)
+            logger.warning(f"Overload offender {vps['container_name']}: {share:.1f}% of host {resource}")
+
+        changed = False
+        for name, vps in list(self.offenders.items()):
+            if vps.get('suspended', False):
+                continue
+            if name not in self.throttled:
+                changed |= await self.throttle(vps, reason)
+            if self.tier >= 2 and name not in self.frozen:
+                changed |= await self.freeze(vps, reason)
+            if self.tier >= 3:
+                if name in self.frozen:
+                    # A frozen instance has to be thawed before it can shut down cleanly
+                    try:
+                        await container_ops.run(name, 'unfreeze', lambda: set_container_state(name, 'unfreeze'))
+                    except Exception as e:
+                        logger.error(f"Failed to unfreeze {name} before stopping: {e}")
+                    self.frozen.discard(name)
+                changed |= await auto_suspend(vps, f"{reason} (overload tier stop)")
+        if changed:
+            save_data()
+
+    async def relax(self):
+        tier_name = OVERLOAD_TIERS[self.tier]
+        self.tier -= 1
+        logger.info(f"Host load recovered. Relaxing overload response from {tier_name} to {OVERLOAD_TIERS[self.tier]}")
+        changed = False
+        if self.tier < 2:
+            for name in list(self.frozen):
+                changed |= await self.unfreeze(self.offender(name))
+        if self.tier < 1:
+            for name in list(self.throttled):
+                changed |= await self.unthrottle(self.offender(name))
+            self.offenders.clear()
+        if changed:
+            save_data()
+
+    def offender(self, name: str) -> Dict:
+        """Record for a throttled/frozen container, even after offenders were cleared"""
+        vps = self.offenders.get(name)
+        if vps is None:
+            found = bot.find_vps(name)
+            vps = found[1] if found else {'container_name': name}
+        return vps
+
+    def record(self, vps: Dict, action: str, reason: str):
+        bot.record_history(vps['container_name'], reason, 'ZorvixHost Overload Engine', action=action)
+
+    async def throttle(self, vps: Dict, reason: str) -> bool:
+        name = vps['container_name']
+        try:
+            async def apply_throttle():
+                await execute_lxc(f"lxc config set {name} limits.cpu.allowance {OVERLOAD_THROTTLE_ALLOWANCE}")
+                await execute_lxc(f"lxc config set {name} limits.cpu.priority {OVERLOAD_THROTTLE_PRIORITY}")
+            await container_ops.run(name, 'throttle', apply_throttle)
+        except Exception as e:
+            logger.error(f"Failed to throttle {name}: {e}")
+            return False
+        self.throttled.add(name)
+        self.record(vps, 'throttle', reason)
+        return True
+
+    async def unthrottle(self, vps: Dict) -> bool:
+        name = vps['container_name']
+        try:
+            async def lift_throttle():
+                # Back to whatever the profiles say (LXD defaults unless a plan sets them)
+                for key in ('limits.cpu.allowance', 'limits.cpu.priority'):
+                    try:
+                        await execute_lxc(f"lxc config unset {name} {key}")
+                    except Exception as e:
+                        if "not currently set" not in str(e):
+                            raise
+            await container_ops.run(name, 'unthrottle', lift_throttle)
+        except Exception as e:
+            logger.error(f"Failed to lift throttle on {name}: {e}")
+            return False
+        self.throttled.discard(name)
+        self.record(vps, 'unthrottle', "Host load recovered")
+        return True
+
+    async def freeze(self, vps: Dict, reason: str) -> bool:
+        name = vps['container_name']
+        try:
+            await container_ops.run(name, 'freeze', lambda: set_container_state(name, 'freeze'))
+        except Exception as e:
+            logger.error(f"Failed to freeze {name}: {e}")
+            return False
+        self.frozen.add(name)
+        fleet_snapshot.update_status(name, 'Frozen')
+        self.record(vps, 'freeze', reason)
+        return True
+
+    async def unfreeze(self, vps: Dict) -> bool:
+        name = vps['container_name']
+        try:
+            await container_ops.run(name, 'unfreeze', lambda: set_container_state(name, 'unfreeze'))
+        except Exception as e:
+            logger.error(f"Failed to unfreeze {name}: {e}")
+            return False
+        self.frozen.discard(name)
+        fleet_snapshot.update_status(name, 'Running')
+        self.record(vps, 'unfreeze', "Host load recovered")
+        return True
+
+    async def stop_all(self, reason: str):
+        """Final tier: force-stop every instance on the host"""
+        try:
+            await execute_lxc("lxc stop --all --force")
+            logger.info("All instances powered down due to critical resource levels")
+            running = [
+                vps for vps_list in bot.vps_data.values() for vps in vps_list
+                if vps.get('status') == 'running'
+            ]
+            for vps in running:
+                bot.set_status(vps['container_name'], 'stopped')
+                self.record(vps, 'stop_all', reason)
+            self.frozen.clear()
+            save_data()
+        except Exception as e:
+            logger.error(f"Error during emergency shutdown: {e}")
+
+overload_responder = OverloadResponder()
+
+# ============================================================================
+# FLEET STATE SNAPSHOT
+# ============================================================================
+
+class FleetSnapshot:
+    """Indexed view of every LXD instance, fetched with a single bulk query.
+
+    Handlers read statuses from here instead of running `lxc info` once per
+    container. The snapshot is refreshed when it is older than
+    FLEET_SNAPSHOT_TTL, and concurrent readers share one refresh.
+    """
+
+    def __init__(self):
+        # container_name -> {"status": ..., "type": ..., "location": ...}
+        self.instances: Dict[str, Dict[str, Any]] = {}
+        self.status_counts: Dict[str, int] = {}
+        self.updated_at = 0.0
+        # Set while the lifecycle watcher keeps the index current
+        self.live = False
+        self._refresh_lock = asyncio.Lock()
+
+    async def refresh(self):
+        """Fetch the state of every instance in one call"""
+        output = await execute_lxc("lxc query /1.0/instances?recursion=1", timeout=60)
+        self.load(json.loads(output))
+
+    def load(self, instances: List[Dict[str, Any]]):
+        """Replace the index with a parsed /1.0/instances listing"""
+        index = {}
+        counts: Dict[str, int] = {}
+        for instance in instances:
+            status = instance.get('status', 'Unknown')
+            index[instance['name']] = {
+                'status': status,
+                'type': instance.get('type', 'container'),
+                'location': instance.get('location', ''),
+            }
+            counts[status] = counts.get(status, 0) + 1
+        self.instances = index
+        self.status_counts = counts
+        self.updated_at = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.updated_at
+
+    async def ensure_fresh(self, max_age: float = FLEET_SNAPSHOT_TTL):
+        """Refresh the snapshot if it is older than max_age seconds"""
+        if self.live or self.age() <= max_age:
+            return
+        async with self._refresh_lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self.age() <= max_age:
+                return
+            await self.refresh()
+
+    def update_status(self, container_name: str, status: str):
+        """Record a status change we already know about without refetching"""
+        instance = self.instances.setdefault(container_name, {'status': 'Unknown', 'type': 'container', 'location': ''})
+        old_status = instance['status']
+        if old_status in self.status_counts:
+            self.status_counts[old_status] -= 1
+        instance['status'] = status
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def forget(self, container_name: str):
+        instance = self.instances.pop(container_name, None)
+        if instance and instance['status'] in self.status_counts:
+            self.status_counts[instance['status']] -= 1
+
+    def status(self, container_name: str) -> str:
+        instance = self.instances.get(container_name)
+        return instance['status'] if instance else "Unknown"
+
+    def is_running(self, container_name: str) -> bool:
+        return self.status(container_name) == "Running"
+
+fleet_snapshot = FleetSnapshot()
+
+# ============================================================================
+# LIFECYCLE EVENT WATCHER
+# ============================================================================
+
+LIFECYCLE_STATUS = {
+    'instance-created': 'Stopped',
+    'instance-started': 'Running',
+    'instance-restarted': 'Running',
+    'instance-resumed': 'Running',
+    'instance-stopped': 'Stopped',
+    'instance-shutdown': 'Stopped',
+    'instance-paused': 'Frozen',
+}
+
+def reconcile_vps_status(container_name: str, lxd_status: str) -> bool:
+    """Bring a record's status in line with what LXD reports.
+
+    Isolated instances keep their status; so do frozen ones, which only the
+    overload engine creates and tracks itself.
+    """
+    found = bot.find_vps(container_name)
+    if found is None:
+        return False
+    _, vps = found
+    if vps.get('suspended', False):
+        return False
+    if lxd_status == 'Running' and vps.get('status') != 'running':
+        bot.set_status(container_name, 'running')
+        return True
+    if lxd_status == 'Stopped' and vps.get('status') == 'running':
+        bot.set_status(container_name, 'stopped')
+        return True
+    return False
+
+class LifecycleWatcher:
+    """Keeps fleet_snapshot and vps_data statuses current from LXD lifecycle events.
+
+    Reads /1.0/events over the LXD socket, or `lxc monitor` when the socket
+    is not available. Every (re)connect is followed by a full resync so
+    events missed during the gap are accounted for.
+    """
+
+    def __init__(self):
+        self.connected = False
+        self.disconnected_at: Optional[float] = None
+
+    async def resync(self):
+        await fleet_snapshot.refresh()
+        changed = 0
+        for vps_list in list(bot.vps_data.values()):
+            for vps in list(vps_list):
+                status = fleet_snapshot.status(vps['container_name'])
+                if status != "Unknown" and reconcile_vps_status(vps['container_name'], status):
+                    changed += 1
+        if changed:
+            save_data()
+        gap = time.monotonic() - self.disconnected_at if self.disconnected_at else 0
+        logger.info(f"Lifecycle watcher resynced after {gap:.0f}s gap, {changed} status corrections")
+
+    async def on_connect(self):
+        await self.resync()
+        self.connected = True
+        fleet_snapshot.live = True
+
+    def handle(self, event: Dict[str, Any]):
+        metadata = event.get('metadata') or {}
+        action = metadata.get('action', '')
+        source = metadata.get('source', '')
+        if not source.startswith('/1.0/instances/'):
+            return
+        container_name = source.split('/')[3].split('?')[0]
+
+        if action == 'instance-deleted':
+            fleet_snapshot.forget(container_name)
+        elif action == 'instance-renamed':
+            old_name = (metadata.get('context') or {}).get('old_name')
+            if old_name:
+                instance = fleet_snapshot.instances.pop(old_name, None)
+                if instance:
+                    fleet_snapshot.instances[container_name] = instance
+        elif action in LIFECYCLE_STATUS:
+            status = LIFECYCLE_STATUS[action]
+            fleet_snapshot.update_status(container_name, status)
+            if reconcile_vps_status(container_name, status):
+                logger.info(f"{container_name} is now {status} ({action})")
+                save_data()
+
+    async def _stream(self):
+        if lxd.available():
+            async for event in lxd.events("lifecycle", on_connect=self.on_connect):
+                self.handle(event)
+            return
+
+        proc = await asyncio.create_subprocess_exec(
+            "lxc", "monitor", "--type=lifecycle", "--format=json",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            await self.on_connect()
+            async for line in proc.stdout:
+                line = line.strip()
+                if line:
+                    self.handle(json.loads(line))
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+
+    async def run(self):
+        """Consume lifecycle events forever, reconnecting with backoff"""
+        backoff = 5
+        while True:
+            started = time.monotonic()
+            try:
+                await self._stream()
+                logger.warning("Lifecycle event stream closed")
+            except Exception as e:
+                logger.warning(f"Lifecycle event stream lost: {e}")
+            if self.connected:
+                self.disconnected_at = time.monotonic()
+            self.connected = False
+            fleet_snapshot.live = False
+            # Reset the backoff once a connection has stayed up for a while
+            backoff = 5 if time.monotonic() - started > 60 else min(backoff * 2, 60)
+            await asyncio.sleep(backoff)
+
+lifecycle_watcher = LifecycleWatcher()
+
+# ============================================================================
+# IMAGE CACHE
+# ============================================================================
+
+def os_name(os_key: str) -> str:
+    return OS_CATALOG.get(os_key, {}).get('name', os_key)
+
+class ImageCache:
+    """Local copies of the OS_CATALOG images under "zorvix-<os>" aliases.
+
+    Provisioning launches from the local fingerprint, so it never resolves a
+    remote alias or downloads mid-request. run() fetches missing images at
+    startup and refreshes every image each IMAGE_REFRESH_INTERVAL; only the
+    very first use of an image that was never fetched waits for a download.
+    """
+
+    def __init__(self):
+        self.fingerprints: Dict[str, str] = {}
+        self.refreshed: Dict[str, float] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def alias(os_key: str) -> str:
+        return f"{IMAGE_ALIAS_PREFIX}{os_key}"
+
+    @staticmethod
+    def key_for(image: str) -> Optional[str]:
+        """Catalog key of an OS key or "remote:alias" source, None if it is not in the catalog"""
+        if image in OS_CATALOG:
+            return image
+        return next((key for key, entry in OS_CATALOG.items() if entry['source'] == image), None)
+
+    async def lookup(self, os_key: str) -> Optional[str]:
+        """Fingerprint the local alias points at, None if it does not exist"""
+        try:
+            output = await execute_lxc(f"lxc query /1.0/images/aliases/{self.alias(os_key)}")
+        except Exception as e:
+            if "not found" in str(e).lower():
+                return None
+            raise
+        return json.loads(output).get('target')
+
+    async def discover(self):
+        """Pick up images cached by a previous run; they count as freshly refreshed"""
+        for os_key in OS_CATALOG:
+            fingerprint = await self.lookup(os_key)
+            if fingerprint:
+                self.fingerprints[os_key] = fingerprint
+                self.refreshed[os_key] = time.monotonic()
+
+    async def refresh(self, os_key: str) -> str:
+        """Fetch or update the local copy of an image (single-flight per image)"""
+        task = self._pending.get(os_key)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(os_key))
+            self._pending[os_key] = task
+            task.add_done_callback(lambda _: self._pending.pop(os_key, None))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, os_key: str) -> str:
+        alias, source = self.alias(os_key), OS_CATALOG[os_key]['source']
+        started = time.monotonic()
+        if await self.lookup(os_key) is None:
+            await execute_lxc(f"lxc image copy {source} local: --alias {alias}", timeout=1800)
+        else:
+            await execute_lxc(f"lxc image refresh {alias}", timeout=1800)
+        fingerprint = await self.lookup(os_key)
+        if fingerprint is None:
+            raise LXDError(f"Image alias {alias} missing after fetching {source}")
+        previous = self.fingerprints.get(os_key)
+        self.fingerprints[os_key] = fingerprint
+        self.refreshed[os_key] = time.monotonic()
+        change = "unchanged" if previous == fingerprint else f"now {fingerprint[:12]}"
+        logger.info(f"Refreshed image {alias} from {source} in {time.monotonic() - started:.1f}s ({change})")
+        return fingerprint
+
+    async def resolve(self, image: str) -> str:
+        """Local fingerprint for a catalog image; images outside the catalog are returned unchanged"""
+        os_key = self.key_for(image)
+        if os_key is None:
+            return image
+        if os_key not in self.fingerprints:
+            return await self.refresh(os_key)
+        return self.fingerprints[os_key]
+
+    def summary(self) -> List[str]:
+        return [
+            f"{os_key} {self.fingerprints[os_key][:12] if os_key in self.fingerprints else 'not cached'}"
+            for os_key in OS_CATALOG
+        ]
+
+    async def run(self):
+        """Fetch missing images now and refresh all of them every IMAGE_REFRESH_INTERVAL.
+
+        Failed fetches are retried after IMAGE_RETRY_INTERVAL, doubling up to
+        the refresh interval, so a missing image is not left for hours.
+        """
+        retry = IMAGE_RETRY_INTERVAL
+        try:
+            await self.discover()
+        except Exception as e:
+            logger.error(f"Image cache discovery failed: {e}")
+        while True:
+            failed = False
+            for os_key in OS_CATALOG:
+                age = time.monotonic() - self.refreshed.get(os_key, float('-inf'))
+                if os_key in self.fingerprints and age < IMAGE_REFRESH_INTERVAL:
+                    continue
+                try:
+                    await self.refresh(os_key)
+                except Exception as e:
+                    failed = True
+                    logger.error(f"Could not refresh image {self.alias(os_key)}: {e}")
+            if failed:
+                await asyncio.sleep(retry)
+                retry = min(retry * 2, IMAGE_REFRESH_INTERVAL)
+            else:
+                retry = IMAGE_RETRY_INTERVAL
+                await asyncio.sleep(IMAGE_REFRESH_INTERVAL)
+
+image_cache = ImageCache()
+
+# ============================================================================
+# WARM POOL
+# ============================================================================
+
+class WarmPool:
+    """Stopped, pre-initialized containers kept ready for /create.
+
+    Members are tagged with WARM_POOL_CONFIG_KEY = "<image>@<storage pool>" so
+    they are rediscovered after a restart. Claiming one is synchronous; the
+    pool is then topped back up in the background, one `lxc init` at a time.
+    """
+
+    def __init__(self):
+        self.targets = {(pool['image'], pool['storage']): pool['size'] for pool in WARM_POOLS}
+        self.members: Dict[Tuple[str, str], List[str]] = {key: [] for key in self.targets}
+        self.hits = 0
+        self.misses = 0
+        # Claimed but possibly still tagged; discover() must not hand these out again
+        self.claiming: set = set()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._seq = 0
+
+    @staticmethod
+    def tag(image: str, storage: str) -> str:
+        return f"{image}@{storage}"
+
+    async def discover(self):
+        """Rebuild the member lists from the tagged instances LXD knows about.
+
+        The lists are updated in place, since a running refill() appends to
+        them; members it prepared while the query was in flight are kept.
+        """
+        known = {name for members in self.members.values() for name in members}
+        output = await execute_lxc("lxc query /1.0/instances?recursion=1", timeout=60)
+        found: Dict[Tuple[str, str], List[str]] = {key: [] for key in self.targets}
+        for instance in json.loads(output):
+            tag = (instance.get('config') or {}).get(WARM_POOL_CONFIG_KEY)
+            if not tag or instance.get('status') != 'Stopped' or instance['name'] in self.claiming:
+                continue
+            image, _, storage = tag.rpartition('@')
+            if (image, storage) in found:
+                found[(image, storage)].append(instance['name'])
+        for key, names in found.items():
+            members = self.members.setdefault(key, [])
+            members[:] = names + [name for name in members if name not in known and name not in names]
+
+    def claim(self, image: str, storage: str) -> Optional[str]:
+        """Take a ready container for this image and pool, or None if there is none"""
+        members = self.members.get((image, storage))
+        self.schedule_refill()
+        if not members:
+            self.misses += 1
+            return None
+        self.hits += 1
+        name = members.pop(0)
+        self.claiming.add(name)
+        return name
+
+    def schedule_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.get_running_loop().create_task(self.refill())
+
+    async def refill(self):
+        for (image, storage), size in self.targets.items():
+            # Looked up every round so a member is never added to a list discover() dropped
+            while len(self.members.setdefault((image, storage), [])) < size:
+                self._seq += 1
+                name = f"{WARM_POOL_PREFIX}{int(time.time())}-{self._seq}"
+                started = time.monotonic()
+                try:
+                    local_image = await image_cache.resolve(image)
+                    await execute_lxc(f"lxc init {local_image} {name} --storage {storage}", timeout=600)
+                    await execute_lxc(f"lxc config set {name} {WARM_POOL_CONFIG_KEY} {self.tag(image, storage)}")
+                except Exception as e:
+                    logger.error(f"Warm pool {self.tag(image, storage)}: failed to prepare {name}: {e}")
+                    try:
+                        await execute_lxc(f"lxc delete {name} --force")
+                    except Exception:
+                        pass
+                    break
+                members = self.members.setdefault((image, storage), [])
+                members.append(name)
+                logger.info(
+                    f"Warm pool {self.tag(image, storage)}: prepared {name} in "
+                    f"{time.monotonic() - started:.1f}s ({len(members)}/{size})"
+                )
+
+    def summary(self) -> List[str]:
+        return [
+            f"{self.tag(image, storage)} {len(self.members.get((image, storage), []))}/{size}"
+            for (image, storage), size in self.targets.items()
+        ]
+
+    async def run(self):
+        """Periodically re-check the pool against LXD and top it up"""
+        while True:
+            try:
+                await self.discover()
+                self.schedule_refill()
+                await self._refill_task
+            except Exception as e:
+                logger.error(f"Warm pool maintenance failed: {e}")
+            await asyncio.sleep(WARM_POOL_CHECK_INTERVAL)
+
+warm_pool = WarmPool()
+
+async def claim_warm_container(container_name: str, image: str, storage: str) -> bool:
+    """Rename a ready warm-pool container to container_name; False if none could be used"""
+    warm = warm_pool.claim(image, storage)
+    if warm:
+        try:
+            # Untag first: a tagged instance would be rediscovered as a pool member
+            await execute_lxc(f"lxc config unset {warm} {WARM_POOL_CONFIG_KEY}")
+            try:
+                await execute_lxc(f"lxc move {warm} {container_name}")
+                fleet_snapshot.forget(warm)
+                return True
+            except Exception as e:
+                logger.error(f"Could not rename warm container {warm} to {container_name}: {e}")
+                try:
+                    await execute_lxc(f"lxc delete {warm} --force")
+                except Exception:
+                    pass
+        except Exception as e:
+            logger.error(f"Could not claim warm container {warm}: {e}")
+        finally:
+            warm_pool.claiming.discard(warm)
+    return False
+
+# ============================================================================
+# PROVISIONING
+# ============================================================================
+
+def plan_profile_name(ram_mb: int, cpu_cores: int, storage_gb: int, storage: str) -> str:
+    return f"zorvix-plan-{ram_mb}m-{cpu_cores}c-{storage_gb}g-{storage}"
+
+class PlanProfiles:
+    """LXD profiles holding the limits and root disk of each resource plan.
+
+    A profile is created the first time its plan is provisioned and then
+    remembered, so later launches only reference it by name.
+    """
+
+    def __init__(self):
+        self.known: set = set()
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    async def ensure(self, ram_mb: int, cpu_cores: int, storage_gb: int, storage: str) -> str:
+        name = plan_profile_name(ram_mb, cpu_cores, storage_gb, storage)
+        if name in self.known:
+            return name
+        task = self._pending.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._create(name, ram_mb, cpu_cores, storage_gb, storage))
+            self._pending[name] = task
+            task.add_done_callback(lambda _: self._pending.pop(name, None))
+        await asyncio.shield(task)
+        self.known.add(name)
+        return name
+
+    async def _create(self, name: str, ram_mb: int, cpu_cores: int, storage_gb: int, storage: str):
+        config = {'limits.memory': f"{ram_mb}MB", 'limits.cpu': str(cpu_cores)}
+        root = {'type': 'disk', 'path': '/', 'pool': storage, 'size': f"{storage_gb}GB"}
+        if lxd.available():
+            if await lxd.get_profile(name) is None:
+                await lxd.create_profile(name, config, {'root': root}, description="ZorvixHost resource plan")
+                logger.info(f"Created plan profile {name}")
+            return
+        try:
+            await execute_lxc(f"lxc profile show {name}")
+            return
+        except Exception:
+            pass
+        await execute_lxc(f"lxc profile create {name}")
+        for key, value in config.items():
+            await execute_lxc(f"lxc profile set {name} {key} {value}")
+        await execute_lxc(f"lxc profile device add {name} root disk path=/ pool={storage} size={storage_gb}GB")
+        logger.info(f"Created plan profile {name}")
+
+plan_profiles = PlanProfiles()
+
+_pool_drivers: Dict[str, str] = {}
+
+async def storage_driver(pool: str) -> str:
+    """Driver of a storage pool (zfs, btrfs, dir, ...), cached per pool"""
+    if pool not in _pool_drivers:
+        output = await execute_lxc(f"lxc query /1.0/storage-pools/{pool}")
+        _pool_drivers[pool] = json.loads(output).get('driver', 'unknown')
+    return _pool_drivers[pool]
+
+async def has_fast_snapshots(pool: str) -> bool:
+    """Whether snapshots on this pool are copy-on-write (not full copies like `dir`)"""
+    try:
+        return await storage_driver(pool) in FAST_SNAPSHOT_DRIVERS
+    except Exception as e:
+        logger.error(f"Could not determine driver of storage pool {pool}: {e}")
+        return False
+
+class ProvisionTimer:
+    """Wall-clock time of each provisioning step"""
+
+    def __init__(self, on_step: Optional[Callable[[str], None]] = None):
+        self.steps: List[Tuple[str, float]] = []
+        self.started = time.monotonic()
+        self.source = "fresh image"
+        self.on_step = on_step
+
+    @contextlib.contextmanager
+    def step(self, name: str):
+        if self.on_step is not None:
+            self.on_step(name)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.monotonic() - started))
+
+    @property
+    def total(self) -> float:
+        return time.monotonic() - self.started
+
+    def summary(self) -> str:
+        return " · ".join(f"{name} {seconds:.1f}s" for name, seconds in self.steps)
+
+async def take_factory_snapshot(container_name: str, storage: str, timer: ProvisionTimer):
+    """Snapshot a fresh instance so a later reinstall can restore it; skipped on pools without CoW snapshots"""
+    if not await has_fast_snapshots(storage):
+        return
+    try:
+        with timer.step("factory snapshot"):
+            await execute_lxc(f"lxc snapshot {container_name} {FACTORY_SNAPSHOT}")
+    except Exception as e:
+        logger.error(f"Could not take factory snapshot of {container_name}: {e}")
+
+async def restore_factory_snapshot(container_name: str,
+                                   progress: Optional[Callable[[str], None]] = None) -> Optional[ProvisionTimer]:
+    """Reinstall by rolling back to the factory snapshot.
+
+    Returns None when that is not possible (no snapshot, or a pool without
+    CoW snapshots) so the caller can rebuild from the image instead. Limits
+    changed since the snapshot was taken are put back afterwards.
+    """
+    timer = ProvisionTimer(progress)
+    timer.source = "factory snapshot"
+    with timer.step("inspect"):
+        try:
+            instance = json.loads(await execute_lxc(f"lxc query /1.0/instances/{container_name}"))
+        except Exception as e:
+            if "not found" in str(e).lower():
+                # Nothing to restore (e.g. an earlier rebuild failed); rebuild from the image
+                return None
+            raise
+        pool = (instance.get('expanded_devices') or {}).get('root', {}).get('pool', DEFAULT_STORAGE_POOL)
+        if not await has_fast_snapshots(pool):
+            return None
+        snapshots = json.loads(await execute_lxc(f"lxc query /1.0/instances/{container_name}/snapshots"))
+        if not any(url.rsplit('/', 1)[-1] == FACTORY_SNAPSHOT for url in snapshots):
+            return None
+    limits = {key: value for key, value in (instance.get('config') or {}).items() if key.startswith('limits.')}
+
+    with timer.step("stop"):
+        if instance.get('status') != 'Stopped':
+            await execute_lxc(f"lxc stop {container_name} --force")
+    with timer.step("restore"):
+        await execute_lxc(f"lxc restore {container_name} {FACTORY_SNAPSHOT}")
+    restored = json.loads(await execute_lxc(f"lxc query /1.0/instances/{container_name}"))
+    changed = {key: value for key, value in limits.items() if (restored.get('config') or {}).get(key) != value}
+    if changed:
+        with timer.step("limits"):
+            for key, value in changed.items():
+                await execute_lxc(f"lxc config set {container_name} {key} {value}")
+    with timer.step("start"):
+        await execute_lxc(f"lxc start {container_name}")
+    logger.info(f"Reinstalled {container_name} from {timer.source} in {timer.total:.1f}s ({timer.summary()})")
+    return timer
+
+async def provision_container(container_name: str, ram_mb: int, cpu_cores: int, storage_gb: int,
+                              image: str = DEFAULT_IMAGE, storage: str = DEFAULT_STORAGE_POOL,
+                              overrides: Optional[Dict[str, str]] = None,
+                              progress: Optional[Callable[[str], None]] = None) -> ProvisionTimer:
+    """Create and start an instance for a resource plan.
+
+    The plan's limits and root disk come from its profile, so a cold
+    provision is a single launch. A warm-pool container only needs the
+    profile applied before it is started. Either way the factory snapshot
+    is taken before the first boot.
+    """
+    timer = ProvisionTimer(progress)
+    overrides = overrides or {}
+    with timer.step("profile"):
+        profile = await plan_profiles.ensure(ram_mb, cpu_cores, storage_gb, storage)
+    profiles = ["default", profile]
+
+    with timer.step("warm claim"):
+        claimed = await claim_warm_container(container_name, image, storage)
+    if claimed:
+        timer.source = "warm pool"
+        root = {'type': 'disk', 'path': '/', 'pool': storage, 'size': f"{storage_gb}GB"}
+        with timer.step("apply plan"):
+            # Warm containers carry their own root device, which takes precedence over the profile's
+            if lxd.available():
+                await lxd.request('PATCH', f"/1.0/instances/{container_name}", {
+                    'profiles': profiles,
+                    'config': overrides,
+                    'devices': {'root': root}
+                })
+            else:
+                await execute_lxc(f"lxc profile assign {container_name} {','.join(profiles)}")
+                await execute_lxc(f"lxc config device set {container_name} root size {storage_gb}GB")
+                for key, value in overrides.items():
+                    await execute_lxc(f"lxc config set {container_name} {key} {value}")
+        await take_factory_snapshot(container_name, storage, timer)
+        with timer.step("start"):
+            await execute_lxc(f"lxc start {container_name}")
+    else:
+        with timer.step("image"):
+            local_image = await image_cache.resolve(image)
+        # Create stopped when a snapshot follows, so it never captures a half-booted guest
+        start = not await has_fast_snapshots(storage)
+        with timer.step("launch"):
+            if lxd.available():
+                await lxd.launch(container_name, local_image, profiles, overrides, start=start)
+            else:
+                flags = " ".join(f"--profile {name}" for name in profiles)
+                flags += "".join(f" --config {key}={value}" for key, value in overrides.items())
+                command = "launch" if start else "init"
+                await execute_lxc(f"lxc {command} {local_image} {container_name} {flags}", timeout=300)
+        if not start:
+            await take_factory_snapshot(container_name, storage, timer)
+            with timer.step("start"):
+                await execute_lxc(f"lxc start {container_name}")
+    logger.info(f"Provisioned {container_name} from {timer.source} in {timer.total:.1f}s ({timer.summary()})")
+    return timer
+
+# ============================================================================
+# BACKGROUND JOBS
+# ============================================================================
+
+JOB_ICONS = {'queued': '🕓', 'running': '⏳', 'done': '✅', 'failed': '❌'}
+
+class Job:
+    """One queued unit of LXC work and the Telegram message that tracks it"""
+
+    def __init__(self, job_id: int, kind: str, title: str, user_id: int,
+                 work: Callable[['Job'], Awaitable[str]], message: Optional[Message] = None,
+                 failure_title: str = "Operation Failed"):
+        self.id = job_id
+        self.kind = kind
+        self.title = title
+        self.user_id = user_id
+        self.work = work
+        self.message = message
+        self.failure_title = failure_title
+        self.state = 'queued'
+        self.progress = ""
+        self.error: Optional[str] = None
+        self.created_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.followups: List[str] = []
+        self._last_edit = 0.0
+        self._edit_task: Optional[asyncio.Task] = None
+
+    def elapsed(self) -> float:
+        end = self.finished_at or time.monotonic()
+        return end - (self.started_at or self.created_at)
+
+    def render(self) -> str:
+        text = f"{format_bold(f'{JOB_ICONS[self.state]} {self.title}')}\n\n"
+        text += f"• Job: {format_code(f'#{self.id}')}\n"
+        text += f"• State: {format_code(self.state)}\n"
+        if self.progress:
+            text += f"• Step: {format_code(self.progress)}\n"
+        text += f"• Elapsed: {format_code(f'{self.elapsed():.0f}s')}"
+        return text
+
+    def report(self, progress: str):
+        """Record the current step; the status message is edited at most every JOB_PROGRESS_INTERVAL"""
+        self.progress = progress
+        if self._edit_task is None or self._edit_task.done():
+            self._edit_task = asyncio.get_running_loop().create_task(self._push_progress())
+
+    async def _push_progress(self):
+        delay = JOB_PROGRESS_INTERVAL - (time.monotonic() - self._last_edit)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.edit(self.render())
+
+    async def edit(self, text: str):
+        if self.message is None:
+            return
+        self._last_edit = time.monotonic()
+        try:
+            await self.message.edit_text(text, parse_mode='Markdown')
+        except Exception as e:
+            if "not modified" in str(e).lower():
+                return
+            logger.warning(f"Could not update job #{self.id} message: {e}")
+
+    async def finish(self, text: str):
+        """Show the result, followed by any follow-up messages the job queued"""
+        if self._edit_task is not None and not self._edit_task.done():
+            self._edit_task.cancel()
+        await self.edit(text)
+        if self.message is None:
+            return
+        for followup in self.followups:
+            try:
+                await self.message.reply_text(followup, parse_mode='Markdown')
+            except Exception as e:
+                logger.warning(f"Could not send job #{self.id} follow-up: {e}")
+
+class JobManager:
+    """Bounded worker pool for slow LXC operations.
+
+    Handlers submit a job and return straight away; JOB_WORKERS workers run
+    jobs in submission order and keep the job's status message up to date.
+    Finished jobs are kept in a short history for /jobs.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.active: Dict[int, Job] = {}
+        self.history: deque = deque(maxlen=JOB_HISTORY)
+        self._queue: Optional[asyncio.Queue] = None
+        self._next_id = 1
+
+    def submit(self, kind: str, title: str, user_id: int, work: Callable[[Job], Awaitable[str]],
+               message: Optional[Message] = None, failure_title: str = "Operation Failed") -> Job:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        job = Job(self._next_id, kind, title, user_id, work, message, failure_title)
+        self._next_id += 1
+        self.active[job.id] = job
+        self._queue.put_nowait(job)
+        logger.info(f"Queued job #{job.id} ({kind}): {title}")
+        return job
+
+    async def _execute(self, job: Job):
+        job.state = 'running'
+        job.started_at = time.monotonic()
+        await job.edit(job.render())
+        try:
+            text = await job.work(job)
+            job.state = 'done'
+        except Exception as e:
+            job.state = 'failed'
+            job.error = str(e)
+            logger.error(f"Job #{job.id} ({job.kind}) failed: {e}")
+            text = f"{format_bold(f'❌ {job.failure_title}')}\n\nError: {format_code(str(e))}"
+        job.finished_at = time.monotonic()
+        logger.info(f"Job #{job.id} ({job.kind}) {job.state} in {job.elapsed():.1f}s")
+        await job.finish(text)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self.active.pop(job.id, None)
+                self.history.append(job)
+                self._queue.task_done()
+
+    async def run(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        await asyncio.gather(*(self._worker() for _ in range(self.workers)))
+
+    def visible_to(self, user_id: int) -> Tuple[List[Job], List[Job]]:
+        """(in-flight, recent) jobs this user may see; admins see everything"""
+        def visible(job: Job) -> bool:
+            return is_admin(user_id) or job.user_id == user_id
+        in_flight = [job for job in self.active.values() if visible(job)]
+        recent = [job for job in reversed(self.history) if visible(job)]
+        return in_flight, recent
+
+jobs = JobManager()
+
+# ============================================================================
+# PROVISIONING LEDGER
+# ============================================================================
+
+class ProvisioningLedger:
+    """Persisted step of every in-flight create and reinstall.
+
+    Each operation is a short sequence of idempotent steps; the ledger file
+    is rewritten before a step starts, so after a crash startup knows how far
+    every operation got and can resume or roll it back. Instance names are
+    reserved here, synchronously, so concurrent creates never collide, and a
+    name is only handed out once LXD has confirmed no instance holds it.
+
+      create:    reserve -> launch -> record
+      reinstall: restore -> rebuild (only when no factory snapshot applies)
+    """
+
+    def __init__(self, path: str = PROVISION_LEDGER_FILE):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._write_lock: Optional[asyncio.Lock] = None
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        except json.JSONDecodeError as e:
+            logger.error(f"Unreadable provisioning ledger {self.path}: {e}")
+            self.entries = {}
+        if self.entries:
+            logger.info(f"Provisioning ledger has {len(self.entries)} unfinished operations")
+
+    async def _save(self):
+        """Write the ledger in the executor; writes are serialized so the newest state lands last"""
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        async with self._write_lock:
+            data = json.dumps(self.entries, indent=2).encode()
+            await asyncio.get_running_loop().run_in_executor(None, write_file_atomic, self.path, data)
+
+    async def reserve(self, user_id: str, spec: Dict[str, Any]) -> str:
+        """Reserve the first free zorvix-instance-<user>-<n> and record the create"""
+        await fleet_snapshot.ensure_fresh()
+        number = len(bot.vps_data.get(user_id, [])) + 1
+        while True:
+            name = f"zorvix-instance-{user_id}-{number}"
+            number += 1
+            if bot.find_vps(name) is not None or name in self.entries or name in fleet_snapshot.instances:
+                continue
+            # The name is taken as soon as the entry exists; until LXD has confirmed
+            # it is free the entry stays at 'reserve', which recovery simply drops
+            self.entries[name] = {
+                'kind': 'create',
+                'user_id': user_id,
+                'spec': spec,
+                'step': 'reserve',
+                'started_at': datetime.now().isoformat()
+            }
+            try:
+                exists = await instance_exists(name)
+            except Exception:
+                del self.entries[name]
+                raise
+            if not exists:
+                break
+            # An instance the bot does not know about (e.g. left by a crash) keeps its name
+            logger.warning(f"Skipping {name} for user {user_id}: an unrecorded instance already uses it")
+            del self.entries[name]
+        await self.advance(name, 'launch')
+        return name
+
+    async def begin(self, container_name: str, kind: str, user_id: str, spec: Dict[str, Any], step: str):
+        self.entries[container_name] = {
+            'kind': kind,
+            'user_id': user_id,
+            'spec': spec,
+            'step': step,
+            'started_at': datetime.now().isoformat()
+        }
+        await self._save()
+
+    async def advance(self, container_name: str, step: str):
+        self.entries[container_name]['step'] = step
+        await self._save()
+
+    async def complete(self, container_name: str):
+        if self.entries.pop(container_name, None) is not None:
+            await self._save()
+
+provisioning_ledger = ProvisioningLedger()
+
+def plan_spec(ram_mb: int, cpu_cores: int, storage_gb: int, os_key: str = DEFAULT_OS) -> Dict[str, Any]:
+    return {'ram_mb': ram_mb, 'cpu_cores': cpu_cores, 'storage_gb': storage_gb, 'os': os_key,
+            'image': OS_CATALOG[os_key]['source'], 'storage': DEFAULT_STORAGE_POOL}
+
+def plan_record(container_name: str, spec: Dict[str, Any]) -> VPSRecord:
+    ram, cpu, disk = spec['ram_mb'] // 1024, spec['cpu_cores'], spec['storage_gb']
+    return VPSRecord(
+        container_name,
+        ram_mb=spec['ram_mb'],
+        cpu_cores=cpu,
+        storage_gb=disk,
+        config=f"{ram}GB RAM / {cpu} Cores / {disk}GB Storage",
+        status=VPSStatus.RUNNING,
+        suspension_history=[],
+        created_at=datetime.now().isoformat(),
+        shared_with=[],
+        extra={'os': spec.get('os', DEFAULT_OS)}
+    )
+
+async def instance_exists(container_name: str) -> bool:
+    try:
+        await execute_lxc(f"lxc query /1.0/instances/{container_name}")
+    except Exception as e:
+        if "not found" in str(e).lower():
+            return False
+        raise
+    return True
+
+async def discard_container(container_name: str):
+    """Force-delete an instance; an instance that does not exist counts as deleted"""
+    try:
+        await execute_lxc(f"lxc delete {container_name} --force")
+    except Exception as e:
+        if "not found" not in str(e).lower():
+            raise
+
+async def provision_from_spec(container_name: str, user_id: str, spec: Dict[str, Any],
+                              progress: Optional[Callable[[str], None]] = None) -> ProvisionTimer:
+    return await provision_container(
+        container_name, spec['ram_mb'], spec['cpu_cores'], spec['storage_gb'],
+        image=spec['image'], storage=spec['storage'],
+        overrides={'user.zorvix.owner': str(user_id)},
+        progress=progress
+    )
+
+async def create_instance(user_id: str, spec: Dict[str, Any],
+                          progress: Optional[Callable[[str], None]] = None) -> Tuple[str, ProvisionTimer]:
+    """Reserve a name, provision it and record the new instance for user_id"""
+    container_name = await provisioning_ledger.reserve(user_id, spec)
+    try:
+        timer = await provision_from_spec(container_name, user_id, spec, progress=progress)
+    except Exception as e:
+        # The name was free when reserved; an instance that appeared since is not ours to delete
+        if "already exists" not in str(e).lower():
+            await discard_container(container_name)
+        await provisioning_ledger.complete(container_name)
+        raise
+    
+    await provisioning_ledger.advance(container_name, 'record')
+    bot.add_vps(user_id, plan_record(container_name, spec))
+    save_data()
+    await persister.flush()
+    await provisioning_ledger.complete(container_name)
+    return container_name, timer
+
+async def resume_provisioning(container_name: str, entry: Dict[str, Any]) -> str:
+    """Finish or undo one ledger entry left behind by a crash; returns what was done"""
+    user_id, spec, step = entry['user_id'], entry['spec'], entry['step']
+    if entry['kind'] == 'create':
+        if step == 'reserve':
+            # Stopped before LXD confirmed the name was free; nothing was created
+            outcome = "dropped"
+        elif step == 'launch':
+            # The launch may have stopped anywhere; the admin can simply /create again
+            await discard_container(container_name)
+            outcome = "rolled back"
+        else:
+            if bot.find_vps(container_name) is None:
+                bot.add_vps(user_id, plan_record(container_name, spec))
+                save_data()
+                await persister.flush()
+            outcome = "recorded"
+    elif bot.find_vps(container_name) is None:
+        # Deleted while the reinstall was in flight
+        await discard_container(container_name)
+        outcome = "discarded"
+    elif step == 'restore':
+        # A snapshot restore is atomic in LXD; only the start may be missing
+        try:
+            await execute_lxc(f"lxc start {container_name}")
+        except Exception:
+            pass
+        outcome = "restarted"
+    else:
+        await discard_container(container_name)
+        await provision_from_spec(container_name, user_id, spec)
+        bot.update_vps(container_name, status="running", suspended=False, created_at=datetime.now().isoformat(),
+                       os=spec.get('os', DEFAULT_OS))
+        save_data()
+        await persister.flush()
+        outcome = "rebuilt"
+    await provisioning_ledger.complete(container_name)
+    logger.info(f"Recovered {entry['kind']} of {container_name} at step {step}: {outcome}")
+    return outcome
+
+async def recover_provisioning(job: Job) -> str:
+    """Startup job resuming or rolling back every unfinished ledger entry"""
+    lines = []
+    for container_name, entry in list(provisioning_ledger.entries.items()):
+        job.report(container_name)
+        try:
+            outcome = await container_ops.run(
+                container_name, 'recover',
+                lambda name=container_name, entry=entry: resume_provisioning(name, entry), wait=True
+            )
+        except Exception as e:
+            # Left in the ledger; the next start tries again
+            logger.error(f"Could not recover {entry['kind']} of {container_name}: {e}")
+            outcome = f"failed ({e})"
+        lines.append(f"• {format_code(container_name)} {entry['kind']}: {outcome}")
+    return f"{format_bold('♻️ Provisioning Recovery')}\n\n" + "\n".join(lines)
+
+# ============================================================================
+# SSH SESSIONS
+# ============================================================================
+
+# Removes sockets in the guest whose tmate server is gone
+TMATE_CLEANUP_SCRIPT = (
+    'for s in /tmp/zorvix-session-*.sock; do '
+    '[ -S "$s" ] && tmate -S "$s" has-session 2>/dev/null || rm -f "$s"; '
+    'done'
+)
+
+class TmateSessions:
+    """Per-container registry of live tmate sessions for the SSH button.
+
+    A session is handed out again until it is TMATE_SESSION_TTL old, after a
+    single liveness check. New sessions are awaited with `tmate wait
+    tmate-ready` instead of a fixed sleep. Whether tmate is installed is
+    remembered per container until it is reinstalled or deleted, and expired
+    or dead sessions are killed and their sockets removed by run(). A session
+    that is replaced is killed before the new one starts; if that fails it
+    is kept in `retired` and killed again by run().
+    """
+
+    def __init__(self):
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.retired: List[Tuple[str, Dict[str, Any]]] = []
+        self.installed: set = set()
+        self.reused = 0
+        self.created = 0
+
+    def on_event(self, event: str, payload: Dict[str, Any]):
+        container_name = payload.get('container_name')
+        if event == 'delete' or (event == 'update' and 'created_at' in payload['fields']):
+            self.sessions.pop(container_name, None)
+            self.installed.discard(container_name)
+            self.retired = [(name, s) for name, s in self.retired if name != container_name]
+        elif event == 'suspend' or (event == 'status' and payload['status'] != 'running'):
+            # Stopping the container ends its tmate servers too
+            self.sessions.pop(container_name, None)
+            self.retired = [(name, s) for name, s in self.retired if name != container_name]
+
+    async def _display(self, container_name: str, socket: str) -> Optional[str]:
+        returncode, stdout, _ = await exec_in_container(
+            container_name, ["tmate", "-S", socket, "display", "-p", "#{tmate_ssh}"], timeout=10
+        )
+        return (stdout.strip() or None) if returncode == 0 else None
+
+    async def alive(self, container_name: str, session: Dict[str, Any]) -> Optional[bool]:
+        """True/False when tmate answered, None when the check itself failed (busy guest, timeout)"""
+        try:
+            url = await self._display(container_name, session['socket'])
+        except Exception as e:
+            logger.debug(f"Could not check tmate session {session['name']} in {container_name}: {e}")
+            return None
+        if url is None:
+            return False
+        session['url'] = url
+        return True
+
+    async def reuse(self, container_name: str) -> Optional[Dict[str, Any]]:
+        """The container's current session if it is still fresh and alive"""
+        session = self.sessions.get(container_name)
+        if session is None or time.monotonic() - session['started'] >= TMATE_SESSION_TTL:
+            return None
+        if not await self.alive(container_name, session):
+            return None
+        self.reused += 1
+        return session
+
+    async def _ensure_installed(self, container_name: str, progress: Optional[Callable[[str], None]]):
+        if container_name in self.installed:
+            return
+        returncode, _, _ = await exec_in_container(container_name, ["which", "tmate"])
+        if returncode != 0:
+            if progress:
+                progress("installing tmate")
+            await execute_lxc(f"lxc exec {container_name} -- sudo apt-get update -y")
+            await execute_lxc(f"lxc exec {container_name} -- sudo apt-get install tmate -y")
+            returncode, _, _ = await exec_in_container(container_name, ["which", "tmate"])
+            if returncode != 0:
+                raise Exception("tmate could not be installed")
+        self.installed.add(container_name)
+
+    async def open(self, container_name: str, progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Reuse the container's session or start a new one and wait until it is ready"""
+        session = await self.reuse(container_name)
+        if session is not None:
+            return session
+        stale = self.sessions.pop(container_name, None)
+        if stale is not None:
+            await self.retire(container_name, stale)
+        try:
+            return await self._start(container_name, progress)
+        except Exception:
+            # tmate may have been removed in the guest; check again next time
+            self.installed.discard(container_name)
+            raise
+
+    async def _start(self, container_name: str, progress: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+        await self._ensure_installed(container_name, progress)
+        if progress:
+            progress("starting tmate session")
+        await exec_in_container(container_name, ["sh", "-c", TMATE_CLEANUP_SCRIPT])
+        session_name = f"zorvix-session-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        socket = f"/tmp/{session_name}.sock"
+        await execute_lxc(f"lxc exec {container_name} -- tmate -S {socket} new-session -d")
+        returncode, _, stderr = await exec_in_container(
+            container_name, ["tmate", "-S", socket, "wait", "tmate-ready"], timeout=TMATE_READY_TIMEOUT
+        )
+        if returncode != 0:
+            raise Exception(stderr.strip() or "tmate session did not become ready")
+        url = await self._display(container_name, socket)
+        if url is None:
+            raise Exception("tmate did not report an SSH address")
+        session = {'name': session_name, 'socket': socket, 'url': url, 'started': time.monotonic()}
+        self.sessions[container_name] = session
+        self.created += 1
+        return session
+
+    async def close(self, container_name: str, session: Dict[str, Any]) -> bool:
+        try:
+            returncode, _, stderr = await exec_in_container(
+                container_name,
+                ["sh", "-c", f"tmate -S {session['socket']} kill-server 2>/dev/null; rm -f {session['socket']}"],
+                timeout=10
+            )
+        except Exception as e:
+            logger.debug(f"Could not close tmate session {session['name']} in {container_name}: {e}")
+            return False
+        if returncode != 0:
+            logger.debug(f"Could not close tmate session {session['name']} in {container_name}: {stderr.strip()}")
+            return False
+        return True
+
+    async def retire(self, container_name: str, session: Dict[str, Any]):
+        """Kill a session that is being replaced, keeping it for run() if that fails"""
+        if not await self.close(container_name, session):
+            self.retired.append((container_name, session))
+
+    async def reap(self):
+        """Close expired sessions and clean up after ones whose server has died"""
+        retired, self.retired = self.retired, []
+        for container_name, session in retired:
+            await container_ops.run(
+                container_name, 'ssh-reap',
+                lambda name=container_name, session=session: self.retire(name, session), wait=True
+            )
+        for container_name, session in list(self.sessions.items()):
+            expired = time.monotonic() - session['started'] >= TMATE_SESSION_TTL
+            # Only a definite "no server" counts as dead; a failed check is retried next round
+            if not expired and await self.alive(container_name, session) is not False:
+                continue
+            if self.sessions.get(container_name) is session:
+                del self.sessions[container_name]
+            await container_ops.run(
+                container_name, 'ssh-reap',
+                lambda name=container_name, session=session: self.close(name, session), wait=True
+            )
+            logger.info(f"Reaped {'expired' if expired else 'dead'} tmate session {session['name']} in {container_name}")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(TMATE_REAP_INTERVAL)
+            try:
+                await self.reap()
+            except Exception as e:
+                logger.error(f"tmate session reaper failed: {e}")
+
+tmate_sessions = TmateSessions()
+bot.subscribe(tmate_sessions.on_event)
+
+# ============================================================================
+# CONTAINER METRICS COLLECTOR
+# ============================================================================
+
+class ContainerMetricsCollector:
+    """Reads container resource usage from the host's cgroup v2 hierarchy.
+
+    Nothing here enters the guest: every value comes from files under
+    CGROUP_ROOT or /proc on the host, so a probe costs a few small reads
+    instead of an `lxc exec` process per metric.
+    """
+
+    def __init__(self, cgroup_root: str = CGROUP_ROOT):
+        self.cgroup_root = cgroup_root
+        # container_name -> (monotonic time, cpu usage_usec, last cpu pct)
+        self._cpu_samples: Dict[str, Tuple[float, int, float]] = {}
+
+    def cgroup_path(self, container_name: str) -> str:
+        return os.path.join(self.cgroup_root, CONTAINER_CGROUP_TEMPLATE.format(name=container_name))
+
+    def _read(self, container_name: str, filename: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.cgroup_path(container_name), filename), 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _read_keyed(self, container_name: str, filename: str) -> Optional[Dict[str, int]]:
+        """Parse flat keyed files such as cpu.stat and memory.stat"""
+        content = self._read(container_name, filename)
+        if content is None:
+            return None
+        values = {}
+        for line in content.splitlines():
+            parts = line.split()
+            if len(parts) == 2 and parts[1].isdigit():
+                values[parts[0]] = int(parts[1])
+        return values
+
+    def _cpu_usage_usec(self, container_name: str) -> Optional[int]:
+        stat = self._read_keyed(container_name, "cpu.stat")
+        if not stat or "usage_usec" not in stat:
+            return None
+        return stat["usage_usec"]
+
+    def cpu_count(self, container_name: str) -> float:
+        """Number of CPUs the container may use (quota first, then cpuset)"""
+        cpu_max = self._read(container_name, "cpu.max")
+        if cpu_max:
+            quota, _, period = cpu_max.partition(" ")
+            if quota != "max" and period:
+                return max(int(quota) / int(period), 0.01)
+        cpuset = self._read(container_name, "cpuset.cpus.effective")
+        if cpuset:
+            count = 0
+            for part in cpuset.split(","):
+                low, _, high = part.partition("-")
+                count += int(high) - int(low) + 1 if high else 1
+            if count:
+                return count
+        return os.cpu_count() or 1
+
+    async def cpu_pct(self, container_name: str) -> float:
+        """CPU usage in percent of the container's allowance.
+
+        Computed from the delta of cpu.stat usage_usec between two samples.
+        The previous sample is kept between calls; when there is none (or the
+        cgroup was recreated) a second sample is taken CPU_SAMPLE_WINDOW
+        seconds later.
+        """
+        usage = self._cpu_usage_usec(container_name)
+        if usage is None:
+            self._cpu_samples.pop(container_name, None)
+            return 0.0
+        now = time.monotonic()
+
+        previous = self._cpu_samples.get(container_name)
+        if previous is not None and usage >= previous[1]:
+            if now - previous[0] < CPU_SAMPLE_WINDOW:
+                return previous[2]
+        else:
+            previous = (now, usage, 0.0)
+            await asyncio.sleep(CPU_SAMPLE_WINDOW)
+            usage = self._cpu_usage_usec(container_name)
+            if usage is None:
+                return 0.0
+            now = time.monotonic()
+
+        elapsed_usec = (now - previous[0]) * 1_000_000
+        pct = (usage - previous[1]) / elapsed_usec / self.cpu_count(container_name) * 100
+        pct = min(max(pct, 0.0), 100.0)
+        self._cpu_samples[container_name] = (now, usage, pct)
+        return pct
+
+    def memory(self, container_name: str) -> Optional[Tuple[int, int]]:
+        """(used, limit) in bytes; page cache that can be reclaimed is not counted as used"""
+        current = self._read(container_name, "memory.current")
+        if current is None:
+            return None
+        used = int(current)
+        stat = self._read_keyed(container_name, "memory.stat") or {}
+        used -= min(stat.get("inactive_file", 0), used)
+
+        limit = self._read(container_name, "memory.max")
+        if limit and limit != "max":
+            total = int(limit)
+        else:
+            total = get_host_memory_total()
+        return used, total
+
+    def io(self, container_name: str) -> Optional[Tuple[int, int]]:
+        """(read, written) bytes summed over all block devices"""
+        content = self._read(container_name, "io.stat")
+        if content is None:
+            return None
+        read_bytes = write_bytes = 0
+        for line in content.splitlines():
+            for field in line.split()[1:]:
+                key, _, value = field.partition("=")
+                if key == "rbytes":
+                    read_bytes += int(value)
+                elif key == "wbytes":
+                    write_bytes += int(value)
+        return read_bytes, write_bytes
+
+    def disk(self, container_name: str) -> Optional[Tuple[int, int]]:
+        """(used, size) bytes of the container's root filesystem.
+
+        Uses statvfs on /proc/<pid>/root of a process inside the container,
+        which sees the same mount as `df /` in the guest.
+        """
+        procs = self._read(container_name, "cgroup.procs")
+        if not procs:
+            # Processes live in leaf cgroups; fall back to the init scope
+            procs = self._read(container_name, "init.scope/cgroup.procs")
+        if not procs:
+            return None
+        pid = procs.split()[0]
+        st = os.statvfs(f"/proc/{pid}/root/")
+        size = st.f_blocks * st.f_frsize
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        return used, size
+
+def get_host_memory_total() -> int:
+    """Host MemTotal in bytes"""
+    try:
+        return read_meminfo().get('MemTotal', 0)
+    except OSError:
+        return 0
+
+metrics_collector = ContainerMetricsCollector()
+
+# ============================================================================
+# CONTAINER STATISTICS
+# ============================================================================
+
+async def get_container_status(container_name: str) -> str:
+    """Get the status of the LXC container from the fleet snapshot"""
+    try:
+        await fleet_snapshot.ensure_fresh()
+    except Exception as e:
+        logger.error(f"Error refreshing fleet snapshot: {e}")
+    return fleet_snapshot.status(container_name)
 
 async def get_container_cpu(container_name: str) -> str:
-    """Get CPU usage inside the container as string"""
+    """Get CPU usage of the container as string"""
     usage = await get_container_cpu_pct(container_name)
     return f"{usage:.1f}%"
 
 async def get_container_cpu_pct(container_name: str) -> float:
-    """Get CPU usage percentage inside the container as float"""
+    """Get CPU usage percentage of the container as float"""
     try:
-        proc = await asyncio.create_subprocess_exec(
-            "lxc", "exec", container_name, "--", "top", "-bn1",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, _ = await proc.communicate()
-        output = stdout.decode()
-        for line in output.splitlines():
-            if '%Cpu(s):' in line:
-                words = line.split()
-                for i, word in enumerate(words):
-                    if word == 'id,':
-                        idle_str = words[i-1].rstrip(',')
-                        try:
-                            idle = float(idle_str)
-                            usage = 100.0 - idle
-                            return usage
-                        except ValueError:
-                            pass
-                break
-        return 0.0
+        return await metrics_collector.cpu_pct(container_name)
     except Exception as e:
         logger.error(f"Error getting CPU for {container_name}: {e}")
         return 0.0
 
-async def get_container_memory(container_name: str) -> str:
-    """Get memory usage inside the container"""
+async def get_container_memory(container_name: str) -> str:
+    """Get memory usage of the container"""
+    try:
+        memory = metrics_collector.memory(container_name)
+        if memory is None:
+            return "Unknown"
+        used, total = memory
+        usage_pct = (used / total * 100) if total > 0 else 0
+        return f"{used // 1048576}/{total // 1048576} MB ({usage_pct:.1f}%)"
+    except Exception:
+        return "Unknown"
+
+async def get_container_ram_pct(container_name: str) -> float:
+    """Get RAM usage percentage of the container as float"""
+    try:
+        memory = metrics_collector.memory(container_name)
+        if memory is None:
+            return 0.0
+        used, total = memory
+        return (used / total * 100) if total > 0 else 0.0
+    except Exception as e:
+        logger.error(f"Error getting RAM for {container_name}: {e}")
+        return 0.0
+
+async def get_container_disk(container_name: str) -> str:
+    """Get root filesystem usage of the container"""
+    try:
+        disk = metrics_collector.disk(container_name)
+        if disk is None:
+            return "Unknown"
+        used, size = disk
+        perc = round(used / size * 100) if size > 0 else 0
+        return f"{format_size(used)}/{format_size(size)} ({perc}%)"
+    except Exception:
+        return "Unknown"
+
+async def get_container_io(container_name: str) -> str:
+    """Get cumulative block I/O of the container"""
+    try:
+        io = metrics_collector.io(container_name)
+        if io is None:
+            return "Unknown"
+        read_bytes, write_bytes = io
+        return f"{format_size(read_bytes)} read / {format_size(write_bytes)} written"
+    except Exception:
+        return "Unknown"
+
+def get_uptime() -> str:
+    """Get host uptime and load in the style of uptime(1)"""
+    try:
+        with open('/proc/uptime', 'r') as f:
+            seconds = int(float(f.read().split()[0]))
+        days, rest = divmod(seconds, 86400)
+        hours, rest = divmod(rest, 3600)
+        text = f"up {days} days, {hours:02d}:{rest // 60:02d}"
+        sample = host_sampler.latest()
+        if sample:
+            load = ", ".join(f"{v:.2f}" for v in sample['load'])
+            text += f", load average: {load}"
+            text += f"\ncpu: {host_sampler.cpu_average(60):.1f}% (1 min avg)"
+            text += f", memory: {format_size(sample['mem_used'])}/{format_size(sample['mem_total'])}"
+        return text
+    except Exception:
+        return "Unknown"
+
+# ============================================================================
+# CONTAINER METRICS CACHE
+# ============================================================================
+
+async def collect_container_metrics(container_name: str) -> Dict[str, Any]:
+    """Collect every metric shown on the control panel in one pass"""
+    status, cpu_pct, ram_pct, memory, disk, io = await asyncio.gather(
+        get_container_status(container_name),
+        get_container_cpu_pct(container_name),
+        get_container_ram_pct(container_name),
+        get_container_memory(container_name),
+        get_container_disk(container_name),
+        get_container_io(container_name)
+    )
+    return {
+        'status': status,
+        'cpu_pct': cpu_pct,
+        'ram_pct': ram_pct,
+        'cpu': f"{cpu_pct:.1f}%",
+        'memory': memory,
+        'disk': disk,
+        'io': io,
+        'collected_at': datetime.now()
+    }
+
+class MetricsCache:
+    """Per-container metrics shared by the control panel and vps_monitor.
+
+    Entries younger than the TTL are served as-is. Stale entries are still
+    served immediately while a background refresh runs, and concurrent
+    refreshes of the same container share one in-flight collection.
+    """
+
+    def __init__(self, ttl: float = METRICS_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def is_stale(self, entry: Dict[str, Any]) -> bool:
+        return (datetime.now() - entry['collected_at']).total_seconds() > self.ttl
+
+    def refresh(self, container_name: str) -> asyncio.Future:
+        """Start (or join) a collection for the container"""
+        task = self._inflight.get(container_name)
+        if task is None:
+            task = asyncio.ensure_future(self._collect(container_name))
+            self._inflight[container_name] = task
+            task.add_done_callback(lambda t: self._inflight.pop(container_name, None))
+        # Shield so a caller's timeout does not cancel the shared collection
+        return asyncio.shield(task)
+
+    async def _collect(self, container_name: str) -> Dict[str, Any]:
+        try:
+            entry = await collect_container_metrics(container_name)
+        except Exception as e:
+            logger.error(f"Error collecting metrics for {container_name}: {e}")
+            raise
+        self._entries[container_name] = entry
+        return entry
+
+    async def get(self, container_name: str) -> Dict[str, Any]:
+        """Cached metrics, refreshed in the background once stale"""
+        entry = self._entries.get(container_name)
+        if entry is None:
+            return await self.refresh(container_name)
+        if self.is_stale(entry):
+            self.refresh(container_name).add_done_callback(_consume_exception)
+        return entry
+
+    def invalidate(self, container_name: str):
+        self._entries.pop(container_name, None)
+
+def _consume_exception(future: asyncio.Future):
+    """Done-callback for fire-and-forget futures; errors are already logged"""
+    if not future.cancelled():
+        future.exception()
+
+def format_metrics_age(entry: Dict[str, Any]) -> str:
+    """Describe when cached metrics were collected"""
+    text = f"Updated {entry['collected_at'].strftime('%H:%M:%S')}"
+    if metrics_cache.is_stale(entry):
+        text += " (refreshing...)"
+    return text
+
+metrics_cache = MetricsCache()
+
+# ============================================================================
+# METRIC HISTORY & SUSPEND POLICIES
+# ============================================================================
+
+class MetricHistory:
+    """Fixed-size ring buffer of (time, cpu %, ram %) samples for one container"""
+
+    __slots__ = ('times', 'cpu', 'ram', '_next', '_count')
+
+    def __init__(self, capacity: int = HISTORY_SAMPLES):
+        self.times = array('d', bytes(8 * capacity))
+        self.cpu = array('f', bytes(4 * capacity))
+        self.ram = array('f', bytes(4 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, cpu: float, ram: float, timestamp: Optional[float] = None):
+        i = self._next
+        self.times[i] = time.time() if timestamp is None else timestamp
+        self.cpu[i] = cpu
+        self.ram[i] = ram
+        self._next = (i + 1) % len(self.times)
+        self._count = min(self._count + 1, len(self.times))
+
+    def recent(self, metric: str, samples: Optional[int] = None, seconds: Optional[float] = None) -> List[float]:
+        """Most recent values of a metric, newest first, limited by count and/or age"""
+        values = getattr(self, metric)
+        capacity = len(self.times)
+        limit = self._count if samples is None else min(samples, self._count)
+        cutoff = time.time() - seconds if seconds is not None else None
+        result = []
+        for n in range(1, limit + 1):
+            i = (self._next - n) % capacity
+            if cutoff is not None and self.times[i] < cutoff:
+                break
+            result.append(values[i])
+        return result
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def summarize_history(history: MetricHistory, metric: str) -> Optional[Dict[str, float]]:
+    """min / avg / p95 of everything in the buffer"""
+    values = history.recent(metric)
+    if not values:
+        return None
+    return {
+        'min': min(values),
+        'avg': sum(values) / len(values),
+        'p95': percentile(values, 95)
+    }
+
+def evaluate_suspend_policies(history: MetricHistory) -> Optional[str]:
+    """Return a suspension reason if any SUSPEND_POLICIES entry trips"""
+    for policy in SUSPEND_POLICIES:
+        metric = policy['metric']
+        if policy['type'] == 'sustained':
+            # Only consecutive recent samples count; gaps (e.g. while stopped) reset the window
+            window = history.recent(metric, samples=policy['samples'],
+                                    seconds=policy['samples'] * CHECK_INTERVAL * 1.5)
+            if len(window) < policy['samples']:
+                continue
+            hits = sum(1 for value in window if value > policy['threshold'])
+            if hits >= policy['hits']:
+                return (
+                    f"{metric.upper()} above {policy['threshold']}% for {hits} of the last "
+                    f"{policy['samples']} samples (latest {window[0]:.1f}%)"
+                )
+        elif policy['type'] == 'percentile':
+            window = history.recent(metric, seconds=policy['window'])
+            # Require the window to be mostly filled before judging it
+            if len(window) * CHECK_INTERVAL < policy['window'] * 0.8:
+                continue
+            value = percentile(window, policy['percentile'])
+            if value > policy['threshold']:
+                return (
+                    f"{metric.upper()} p{policy['percentile']} over {policy['window'] // 60} minutes "
+                    f"is {value:.1f}% (limit {policy['threshold']}%)"
+                )
+    return None
+
+class MetricHistoryStore:
+    """MetricHistory buffers keyed by container name"""
+
+    def __init__(self):
+        self._buffers: Dict[str, MetricHistory] = {}
+
+    def record(self, container_name: str, cpu: float, ram: float) -> MetricHistory:
+        history = self._buffers.get(container_name)
+        if history is None:
+            history = self._buffers[container_name] = MetricHistory()
+        history.append(cpu, ram)
+        return history
+
+    def get(self, container_name: str) -> Optional[MetricHistory]:
+        return self._buffers.get(container_name)
+
+    def drop(self, container_name: str):
+        self._buffers.pop(container_name, None)
+
+metric_history = MetricHistoryStore()
+
+LXD_STATUS_FOR = {'running': 'Running', 'stopped': 'Stopped', 'suspended': 'Stopped'}
+
+def sync_metric_state(event: str, payload: Dict[str, Any]):
+    """Keep the fleet snapshot, metrics cache and history in step with bot state"""
+    container_name = payload.get('container_name')
+    if not container_name:
+        return
+    if event == 'delete':
+        metrics_cache.invalidate(container_name)
+        metric_history.drop(container_name)
+        fleet_snapshot.forget(container_name)
+    elif event in ('status', 'suspend', 'unsuspend', 'update'):
+        metrics_cache.invalidate(container_name)
+        if event != 'update' or 'created_at' in payload['fields']:
+            # Samples from before a stop, suspension or reinstall say nothing about the instance now
+            metric_history.drop(container_name)
+        status = payload['vps'].get('status')
+        if status in LXD_STATUS_FOR:
+            fleet_snapshot.update_status(container_name, LXD_STATUS_FOR[status])
+
+bot.subscribe(sync_metric_state)
+
+# ============================================================================
+# VPS MONITORING TASK
+# ============================================================================
+
+async def probe_container(container: str) -> Optional[Tuple[float, float]]:
+    """Sample (cpu %, ram %) of a container within MONITOR_PROBE_TIMEOUT"""
+    started = time.monotonic()
     try:
-        proc = await asyncio.create_subprocess_exec(
-            "lxc", "exec", container_name, "--", "free", "-m",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, _ = await proc.communicate()
-        lines = stdout.decode().splitlines()
-        if len(lines) > 1:
-            parts = lines[1].split()
-            total = int(parts[1])
-            used = int(parts[2])
-            usage_pct = (used / total * 100) if total > 0 else 0
-            return f"{used}/{total} MB ({usage_pct:.1f}%)"
-        return "Unknown"
-    except Exception:
-        return "Unknown"
+        # Goes through the shared cache so panels reuse what the sweep collected
+        metrics = await asyncio.wait_for(metrics_cache.refresh(container), timeout=MONITOR_PROBE_TIMEOUT)
+        return metrics['cpu_pct'], metrics['ram_pct']
+    except asyncio.TimeoutError:
+        logger.warning(f"Probe of {container} missed its {MONITOR_PROBE_TIMEOUT}s deadline")
+        return None
+    finally:
+        logger.debug(f"Probed {container} in {(time.monotonic() - started) * 1000:.0f}ms")
 
-async def get_container_ram_pct(container_name: str) -> float:
-    """Get RAM usage percentage inside the container as float"""
+async def auto_suspend(vps: Dict, reason: str) -> bool:
+    """Stop an offending container and record the suspension"""
+    container = vps['container_name']
+    logger.warning(f"Suspending {container}: {reason}")
+    async def suspend():
+        await execute_lxc(f"lxc stop {container}")
+        return bot.suspend_vps(container, reason, 'ZorvixHost Auto-System') is not None
+    
     try:
-        proc = await asyncio.create_subprocess_exec(
-            "lxc", "exec", container_name, "--", "free", "-m",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, _ = await proc.communicate()
-        lines = stdout.decode().splitlines()
-        if len(lines) > 1:
-            parts = lines[1].split()
-            total = int(parts[1])
-            used = int(parts[2])
-            usage_pct = (used / total * 100) if total > 0 else 0
-            return usage_pct
-        return 0.0
+        return await container_ops.run(container, 'suspend', suspend)
     except Exception as e:
-        logger.error(f"Error getting RAM for {container_name}: {e}")
-        return 0.0
+        logger.error(f"Failed to suspend {container}: {e}")
+        return False
 
-async def get_container_disk(container_name: str) -> str:
-    """Get disk usage inside the container"""
-    try:
-        proc = await asyncio.create_subprocess_exec(
-            "lxc", "exec", container_name, "--", "df", "-h", "/",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, _ = await proc.communicate()
-        lines = stdout.decode().splitlines()
-        for line in lines:
-            if '/dev/' in line and ' /' in line:
-                parts = line.split()
-                if len(parts) >= 5:
-                    used = parts[2]
-                    size = parts[1]
-                    perc = parts[4]
-                    return f"{used}/{size} ({perc})"
-        return "Unknown"
-    except Exception:
-        return "Unknown"
+async def monitor_sweep():
+    """Probe every running VPS with bounded parallelism and suspend offenders"""
+    sweep_started = time.monotonic()
+    semaphore = asyncio.Semaphore(MONITOR_CONCURRENCY)
+    latencies = []
 
-def get_uptime() -> str:
-    """Get host uptime"""
-    try:
-        result = subprocess.run(['uptime'], capture_output=True, text=True)
-        return result.stdout.strip()
-    except Exception:
-        return "Unknown"
+    # One bulk query tells us which containers are actually up, unless
+    # lifecycle events are already keeping the snapshot current
+    if not fleet_snapshot.live:
+        await fleet_snapshot.refresh()
+    targets = [
+        vps
+        for vps_list in bot.vps_data.values()
+        for vps in vps_list
+        if vps.get('status') == 'running' and not vps.get('suspended', False)
+        and fleet_snapshot.is_running(vps['container_name'])
+    ]
 
-# ============================================================================
-# VPS MONITORING TASK
-# ============================================================================
+    async def check(vps: Dict) -> Optional[str]:
+        async with semaphore:
+            started = time.monotonic()
+            sample = await probe_container(vps['container_name'])
+            latencies.append(time.monotonic() - started)
+        if sample is None:
+            return None
+        cpu, ram = sample
+        history = metric_history.record(vps['container_name'], cpu, ram)
+        reason = evaluate_suspend_policies(history)
+        if reason:
+            return f"Sustained resource consumption: {reason}"
+        return None
+
+    reasons = await asyncio.gather(*(check(vps) for vps in targets))
+    offenders = [(vps, reason) for vps, reason in zip(targets, reasons) if reason]
+
+    async def suspend(vps: Dict, reason: str) -> bool:
+        async with semaphore:
+            return await auto_suspend(vps, reason)
+
+    if offenders:
+        results = await asyncio.gather(*(suspend(vps, reason) for vps, reason in offenders))
+        if any(results):
+            save_data()
+
+    duration = time.monotonic() - sweep_started
+    if latencies:
+        logger.info(
+            f"VPS sweep: {len(targets)} probed, {len(offenders)} over threshold in {duration:.2f}s "
+            f"(probe avg {sum(latencies) / len(latencies) * 1000:.0f}ms, max {max(latencies) * 1000:.0f}ms)"
+        )
+    if duration > CHECK_INTERVAL / 2:
+        logger.warning(f"VPS sweep took {duration:.1f}s, over half of CHECK_INTERVAL ({CHECK_INTERVAL}s)")
 
 async def vps_monitor():
     """Monitor each VPS for high CPU/RAM usage"""
     while True:
         try:
-            for user_id, vps_list in bot.vps_data.items():
-                for vps in vps_list:
-                    if vps.get('status') == 'running' and not vps.get('suspended', False):
-                        container = vps['container_name']
-                        cpu = await get_container_cpu_pct(container)
-                        ram = await get_container_ram_pct(container)
-                        if cpu > CPU_THRESHOLD or ram > RAM_THRESHOLD:
-                            reason = f"Resource consumption exceeded thresholds: CPU {cpu:.1f}%, RAM {ram:.1f}%"
-                            logger.warning(f"Suspending {container}: {reason}")
-                            try:
-                                await execute_lxc(f"lxc stop {container}")
-                                vps['status'] = 'suspended'
-                                vps['suspended'] = True
-                                if 'suspension_history' not in vps:
-                                    vps['suspension_history'] = []
-                                vps['suspension_history'].append({
-                                    'time': datetime.now().isoformat(),
-                                    'reason': reason,
-                                    'by': 'ZorvixHost Auto-System'
-                                })
-                                save_data()
-                            except Exception as e:
-                                logger.error(f"Failed to suspend {container}: {e}")
+            await monitor_sweep()
             await asyncio.sleep(CHECK_INTERVAL)
         except Exception as e:
             logger.error(f"VPS monitor error: {e}")
@@ -435,16 +3824,26 @@ def create_vps_control_keyboard(vps_index: int, is_owner: bool = True, is_admin:
     
     return InlineKeyboardMarkup(keyboard)
 
-def create_confirm_keyboard(action: str, vps_index: int) -> InlineKeyboardMarkup:
-    """Create confirmation keyboard"""
+def create_confirm_keyboard(action: str, vps_index: int, option: Optional[str] = None) -> InlineKeyboardMarkup:
+    """Create confirmation keyboard; `option` is carried in the confirm button's data"""
+    confirm_data = f"confirm_{action}:{vps_index}" + (f":{option}" if option else "")
     keyboard = [
         [
-            InlineKeyboardButton("✅ Confirm", callback_data=f"confirm_{action}:{vps_index}"),
+            InlineKeyboardButton("✅ Confirm", callback_data=confirm_data),
             InlineKeyboardButton("❌ Cancel", callback_data=f"cancel_{action}:{vps_index}")
         ]
     ]
     return InlineKeyboardMarkup(keyboard)
 
+def create_os_keyboard(vps_index: int) -> InlineKeyboardMarkup:
+    """Create OS catalog keyboard for reinstallation"""
+    keyboard = [
+        [InlineKeyboardButton(f"💿 {entry['name']}", callback_data=f"reinstall_os:{vps_index}:{os_key}")]
+        for os_key, entry in OS_CATALOG.items()
+    ]
+    keyboard.append([InlineKeyboardButton("❌ Cancel", callback_data=f"cancel_reinstall:{vps_index}")])
+    return InlineKeyboardMarkup(keyboard)
+
 # ============================================================================
 # MESSAGE HELPERS
 # ============================================================================
@@ -490,18 +3889,25 @@ async def format_vps_info(vps: Dict, index: int) -> str:
         status += " (ISOLATED)"
     
     # Get live stats
-    lxc_status = await get_container_status(container_name)
-    cpu_usage = await get_container_cpu(container_name)
-    memory_usage = await get_container_memory(container_name)
-    disk_usage = await get_container_disk(container_name)
+    metrics = await metrics_cache.get(container_name)
+    lxc_status = metrics['status']
+    cpu_usage = metrics['cpu']
+    memory_usage = metrics['memory']
+    disk_usage = metrics['disk']
     
     text = f"{format_bold('🖥️ Instance Management')} #{index + 1}\n\n"
     text += f"{format_section('Container:', format_code(container_name))}\n"
     text += f"{format_section('Status:', format_code(status))}\n"
-    text += f"{format_section('LXC Status:', format_code(lxc_status))}\n\n"
+    text += f"{format_section('LXC Status:', format_code(lxc_status))}\n"
+    operation = container_ops.current(container_name)
+    if operation:
+        op, elapsed = operation
+        text += f"{format_section('Operation:', format_code(f'{op} ({elapsed:.0f}s)'))}\n"
+    text += "\n"
     
     text += f"{format_bold('📊 Resource Allocation')}\n"
     text += f"• Configuration: {format_code(vps.get('config', 'Custom'))}\n"
+    text += f"• OS: {format_code(os_name(vps.get('os', DEFAULT_OS)))}\n"
     text += f"• Memory: {format_code(vps['ram'])}\n"
     text += f"• CPU: {format_code(vps['cpu'])}\n"
     text += f"• Storage: {format_code(vps['storage'])}\n\n"
@@ -509,7 +3915,8 @@ async def format_vps_info(vps: Dict, index: int) -> str:
     text += f"{format_bold('📈 Live Metrics')}\n"
     text += f"• CPU: {format_code(cpu_usage)}\n"
     text += f"• Memory: {format_code(memory_usage)}\n"
-    text += f"• Disk: {format_code(disk_usage)}\n\n"
+    text += f"• Disk: {format_code(disk_usage)}\n"
+    text += f"_{format_metrics_age(metrics)}_\n\n"
     
     if suspended:
         text += f"{format_bold('⚠️ Isolated')}\n"
@@ -525,6 +3932,11 @@ async def format_vps_list(vps_list: List[Dict]) -> str:
     if not vps_list:
         return format_bold("❌ No Allocated Instances")
     
+    try:
+        await fleet_snapshot.ensure_fresh()
+    except Exception as e:
+        logger.error(f"Error refreshing fleet snapshot: {e}")
+    
     text = f"{format_bold('📋 Your Instances')}\n\n"
     
     for i, vps in enumerate(vps_list):
@@ -535,6 +3947,7 @@ async def format_vps_list(vps_list: List[Dict]) -> str:
         
         text += f"{format_bold(f'Instance #{i+1}:')} {format_code(vps['container_name'])}\n"
         text += f"  • Status: {format_code(status)}\n"
+        text += f"  • LXC Status: {format_code(fleet_snapshot.status(vps['container_name']))}\n"
         text += f"  • Config: {format_code(config)}\n\n"
     
     text += f"{format_bold('💡 Tip:')} Use /manage to access the control panel."
@@ -620,6 +4033,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         ("/uptime", "Display host uptime"),
         ("/myvps", "List your instances"),
         ("/manage", "Access control panel"),
+        ("/jobs", "Show background jobs"),
         ("/help", "Show this help")
     ]
     for cmd, desc in user_commands:
@@ -629,8 +4043,10 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text += f"\n{format_bold('🛡️ Administrator Commands:')}\n"
         admin_commands = [
             ("/create", "Provision new instance"),
+            ("/create_batch", "Provision many instances"),
             ("/delete_vps", "Decommission instance"),
             ("/serverstats", "Show infrastructure stats"),
+            ("/fleet_check", "Verify fleet totals"),
             ("/restart_vps", "Restart instance"),
             ("/suspend_vps", "Isolate instance"),
             ("/unsuspend_vps", "Remove isolation")
@@ -746,8 +4162,10 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await handle_vps_ssh(update, context, int(parts[1]))
     elif action == "vps_reinstall":
         await handle_vps_reinstall(update, context, int(parts[1]))
+    elif action == "reinstall_os":
+        await handle_reinstall_os(update, context, int(parts[1]), parts[2])
     elif action == "confirm_reinstall":
-        await handle_confirm_reinstall(update, context, int(parts[1]))
+        await handle_confirm_reinstall(update, context, int(parts[1]), parts[2] if len(parts) > 2 else None)
     elif action == "cancel_reinstall":
         await handle_cancel_reinstall(update, context, int(parts[1]))
 
@@ -814,9 +4232,8 @@ async def handle_vps_start(update: Update, context: ContextTypes.DEFAULT_TYPE, v
     container_name = vps['container_name']
     
     try:
-        await execute_lxc(f"lxc start {container_name}")
-        vps['status'] = 'running'
-        vps['suspended'] = False
+        await container_ops.run(container_name, 'start', lambda: execute_lxc(f"lxc start {container_name}"))
+        bot.set_status(container_name, 'running', suspended=False)
         save_data()
         
         text = f"{format_bold('✅ Instance Powered On')}\n\n"
@@ -846,9 +4263,8 @@ async def handle_vps_stop(update: Update, context: ContextTypes.DEFAULT_TYPE, vp
     container_name = vps['container_name']
     
     try:
-        await execute_lxc(f"lxc stop {container_name}", timeout=120)
-        vps['status'] = 'stopped'
-        vps['suspended'] = False
+        await container_ops.run(container_name, 'stop', lambda: execute_lxc(f"lxc stop {container_name}", timeout=120))
+        bot.set_status(container_name, 'stopped', suspended=False)
         save_data()
         
         text = f"{format_bold('✅ Instance Powered Off')}\n\n"
@@ -877,17 +4293,30 @@ async def handle_vps_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, v
     vps = vps_list[vps_index]
     container_name = vps['container_name']
     
-    status = await get_container_status(container_name)
-    cpu_usage = await get_container_cpu(container_name)
-    memory_usage = await get_container_memory(container_name)
-    disk_usage = await get_container_disk(container_name)
+    metrics = await metrics_cache.get(container_name)
+    status = metrics['status']
+    cpu_usage = metrics['cpu']
+    memory_usage = metrics['memory']
+    disk_usage = metrics['disk']
+    io_usage = metrics['io']
     
     text = f"{format_bold('📊 Live Resource Metrics')}\n\n"
     text += f"Real-time statistics for {format_code(container_name)}\n\n"
     text += f"{format_section('Status:', format_code(status.upper()))}\n"
     text += f"{format_section('CPU Utilization:', format_code(cpu_usage))}\n"
     text += f"{format_section('Memory Consumption:', format_code(memory_usage))}\n"
-    text += f"{format_section('Disk Usage:', format_code(disk_usage))}"
+    text += f"{format_section('Disk Usage:', format_code(disk_usage))}\n"
+    text += f"{format_section('Disk I/O:', format_code(io_usage))}\n\n"
+    
+    history = metric_history.get(container_name)
+    if history:
+        text += f"{format_bold(f'📈 History (last {len(history)} samples)')}\n"
+        for label, metric in (("CPU", "cpu"), ("RAM", "ram")):
+            summary = summarize_history(history, metric)
+            values = f"{summary['min']:.1f}% / {summary['avg']:.1f}% / {summary['p95']:.1f}%"
+            text += f"• {label} min/avg/p95: {format_code(values)}\n"
+        text += "\n"
+    text += f"_{format_metrics_age(metrics)}_"
     
     await update.callback_query.message.reply_text(text, parse_mode='Markdown')
 
@@ -910,52 +4339,37 @@ async def handle_vps_ssh(update: Update, context: ContextTypes.DEFAULT_TYPE, vps
         await update.callback_query.message.reply_text(text, parse_mode='Markdown')
         return
     
-    try:
-        # Check if tmate is installed
-        check_proc = await asyncio.create_subprocess_exec(
-            "lxc", "exec", container_name, "--", "which", "tmate",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await check_proc.communicate()
-        
-        if check_proc.returncode != 0:
-            await execute_lxc(f"lxc exec {container_name} -- sudo apt-get update -y")
-            await execute_lxc(f"lxc exec {container_name} -- sudo apt-get install tmate -y")
-        
-        session_name = f"zorvix-session-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        await execute_lxc(f"lxc exec {container_name} -- tmate -S /tmp/{session_name}.sock new-session -d")
-        await asyncio.sleep(3)
-        
-        ssh_proc = await asyncio.create_subprocess_exec(
-            "lxc", "exec", container_name, "--", "tmate", "-S", f"/tmp/{session_name}.sock", "display", "-p", "#{tmate_ssh}",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await ssh_proc.communicate()
-        ssh_url = stdout.decode().strip() if stdout else None
-        
-        if ssh_url:
-            text = f"{format_bold('🔐 Secure SSH Access')}\n\n"
-            text += f"SSH connection established for instance {format_code(container_name)}:\n\n"
-            text += f"{format_code_block(ssh_url)}\n\n"
-            text += f"{format_bold('⚠️ Security Notice:')}\n"
-            text += "• This connection is temporary and secure\n"
-            text += "• Do not share this link\n\n"
-            text += f"Session ID: {format_code(session_name)}"
-            await update.callback_query.message.reply_text(text, parse_mode='Markdown')
-        else:
-            error_msg = stderr.decode().strip() if stderr else "Connection generation failed"
-            text = f"{format_bold('❌ SSH Generation Failed')}\n\n"
-            text += f"Error: {format_code(error_msg)}"
-            await update.callback_query.message.reply_text(text, parse_mode='Markdown')
-    except Exception as e:
-        text = f"{format_bold('❌ SSH Error')}\n\n"
-        text += f"Connection error: {format_code(str(e))}"
-        await update.callback_query.message.reply_text(text, parse_mode='Markdown')
+    def format_session(session: Dict[str, Any]) -> str:
+        remaining = max(0, TMATE_SESSION_TTL - (time.monotonic() - session['started']))
+        text = f"{format_bold('🔐 Secure SSH Access')}\n\n"
+        text += f"SSH connection established for instance {format_code(container_name)}:\n\n"
+        text += f"{format_code_block(session['url'])}\n\n"
+        text += f"{format_bold('⚠️ Security Notice:')}\n"
+        text += "• This connection is temporary and secure\n"
+        text += "• Do not share this link\n\n"
+        text += f"Session ID: {format_code(session['name'])}\n"
+        text += f"_Expires in about {remaining / 60:.0f} minutes_"
+        return text
+    
+    # A live session answers straight away, without queueing behind other jobs
+    session = await tmate_sessions.reuse(container_name)
+    if session is not None:
+        await update.callback_query.message.reply_text(format_session(session), parse_mode='Markdown')
+        return
+    
+    async def work(job: Job) -> str:
+        session = await container_ops.run(container_name, 'ssh', lambda: tmate_sessions.open(container_name, job.report))
+        return format_session(session)
+    
+    message = await update.callback_query.message.reply_text(
+        f"{format_bold('🕓 SSH Session')}\n\nQueued...",
+        parse_mode='Markdown'
+    )
+    jobs.submit('ssh', f"SSH Session: {container_name}", update.effective_user.id, work, message,
+                failure_title="SSH Generation Failed")
 
 async def handle_vps_reinstall(update: Update, context: ContextTypes.DEFAULT_TYPE, vps_index: int):
-    """Handle VPS reinstall - show confirmation"""
+    """Handle VPS reinstall - show OS selection"""
     target_user_id = context.user_data.get('managing_user')
     if not target_user_id:
         return
@@ -973,14 +4387,34 @@ async def handle_vps_reinstall(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.callback_query.message.reply_text(text, parse_mode='Markdown')
         return
     
+    text = f"{format_bold('💿 Select Operating System')}\n\n"
+    text += f"Choose the system to deploy on instance {format_code(container_name)}.\n"
+    text += f"Current: {format_code(os_name(vps.get('os', DEFAULT_OS)))}"
+    
+    keyboard = create_os_keyboard(vps_index)
+    await send_message(update, text, keyboard)
+
+async def handle_reinstall_os(update: Update, context: ContextTypes.DEFAULT_TYPE, vps_index: int, os_key: str):
+    """Handle OS selection for reinstall - show confirmation"""
+    target_user_id = context.user_data.get('managing_user')
+    if not target_user_id or os_key not in OS_CATALOG:
+        return
+    
+    vps_list = bot.vps_data.get(target_user_id, [])
+    if vps_index >= len(vps_list):
+        return
+    
+    container_name = vps_list[vps_index]['container_name']
+    
     text = f"{format_bold('⚠️ Reinstallation Warning')}\n\n"
-    text += f"{format_bold('CRITICAL NOTICE:')} This operation will permanently erase all data on instance {format_code(container_name)} and deploy a fresh Ubuntu 22.04 installation.\n\n"
+    text += f"{format_bold('CRITICAL NOTICE:')} This operation will permanently erase all data on instance {format_code(container_name)} and deploy a fresh {os_name(os_key)} installation.\n\n"
     text += f"{format_bold('Proceed with reinstallation?')}"
     
-    keyboard = create_confirm_keyboard("reinstall", vps_index)
+    keyboard = create_confirm_keyboard("reinstall", vps_index, os_key)
     await send_message(update, text, keyboard)
 
-async def handle_confirm_reinstall(update: Update, context: ContextTypes.DEFAULT_TYPE, vps_index: int):
+async def handle_confirm_reinstall(update: Update, context: ContextTypes.DEFAULT_TYPE, vps_index: int,
+                                   os_key: Optional[str] = None):
     """Handle confirm reinstall"""
     target_user_id = context.user_data.get('managing_user')
     if not target_user_id:
@@ -993,41 +4427,69 @@ async def handle_confirm_reinstall(update: Update, context: ContextTypes.DEFAULT
     vps = vps_list[vps_index]
     container_name = vps['container_name']
     
-    try:
-        await execute_lxc(f"lxc delete {container_name} --force")
-        
-        original_ram = vps["ram"]
-        original_cpu = vps["cpu"]
-        original_storage = vps["storage"]
-        ram_gb = int(original_ram.replace('GB', ''))
-        ram_mb = ram_gb * 1024
-        storage_gb = int(original_storage.replace('GB', ''))
+    is_admin_managing = context.user_data.get('is_admin_managing')
+    current_os = vps.get('os', DEFAULT_OS)
+    if os_key is None:
+        os_key = current_os
+    elif os_key not in OS_CATALOG:
+        return
+    spec = plan_spec(vps.ram_mb, vps.cpu_cores, vps.storage_gb, os_key)
+    
+    async def work(job: Job) -> str:
+        async def reinstall():
+            await provisioning_ledger.begin(container_name, 'reinstall', target_user_id, spec, 'restore')
+            try:
+                # The factory snapshot only helps when the same system is reinstalled
+                if os_key == current_os:
+                    timer = await restore_factory_snapshot(container_name, progress=job.report)
+                    if timer is not None:
+                        return timer
+                await provisioning_ledger.advance(container_name, 'rebuild')
+                job.report("delete")
+                await discard_container(container_name)
+                return await provision_from_spec(container_name, target_user_id, spec, progress=job.report)
+            except Exception:
+                # The admin sees this failure; startup must not retry it behind their back.
+                # A half-built instance is removed so the next reinstall starts clean.
+                if provisioning_ledger.entries.get(container_name, {}).get('step') == 'rebuild':
+                    try:
+                        await discard_container(container_name)
+                    except Exception as e:
+                        logger.error(f"Could not clean up {container_name} after failed reinstall: {e}")
+                await provisioning_ledger.complete(container_name)
+                raise
         
-        await execute_lxc(f"lxc init ubuntu:22.04 {container_name} --storage {DEFAULT_STORAGE_POOL}")
-        await execute_lxc(f"lxc config set {container_name} limits.memory {ram_mb}MB")
-        await execute_lxc(f"lxc config set {container_name} limits.cpu {original_cpu}")
-        await execute_lxc(f"lxc config device set {container_name} root size {storage_gb}GB")
-        await execute_lxc(f"lxc start {container_name}")
+        timer = await container_ops.run(container_name, 'reinstall', reinstall)
         
-        vps["status"] = "running"
-        vps["suspended"] = False
-        vps["created_at"] = datetime.now().isoformat()
-        config_str = f"{ram_gb}GB RAM / {original_cpu} CPU / {storage_gb}GB Disk"
-        vps["config"] = config_str
+        config_str = f"{vps.ram} RAM / {vps.cpu_cores} CPU / {vps.storage_gb}GB Disk"
+        bot.update_vps(
+            container_name,
+            status="running",
+            suspended=False,
+            created_at=datetime.now().isoformat(),
+            config=config_str,
+            os=os_key
+        )
         save_data()
-        
-        text = f"{format_bold('✅ Reinstallation Complete')}\n\n"
-        text += f"Instance {format_code(container_name)} has been successfully redeployed."
-        await update.callback_query.message.reply_text(text, parse_mode='Markdown')
+        await persister.flush()
+        await provisioning_ledger.complete(container_name)
         
         # Refresh the control panel
         new_text = await format_vps_info(vps, vps_index)
-        keyboard = create_vps_control_keyboard(vps_index, is_owner=not context.user_data.get('is_admin_managing'), is_admin=context.user_data.get('is_admin_managing'))
+        keyboard = create_vps_control_keyboard(vps_index, is_owner=not is_admin_managing, is_admin=is_admin_managing)
         await send_message(update, new_text, keyboard)
-    except Exception as e:
-        text = f"{format_bold('❌ Reinstallation Failed')}\n\n"
-        text += f"Error: {format_code(str(e))}"
-        await update.callback_query.message.reply_text(text, parse_mode='Markdown')
+        
+        text = f"{format_bold('✅ Reinstallation Complete')}\n\n"
+        text += f"Instance {format_code(container_name)} has been successfully redeployed with {os_name(os_key)}.\n\n"
+        text += f"_Provisioned in {timer.total:.1f}s from {timer.source}: {timer.summary()}_"
+        return text
+    
+    message = await update.callback_query.message.reply_text(
+        f"{format_bold('🕓 Reinstallation')}\n\nQueued...",
+        parse_mode='Markdown'
+    )
+    jobs.submit('reinstall', f"Reinstall: {container_name}", update.effective_user.id, work, message,
+                failure_title="Reinstallation Failed")
 
 async def handle_cancel_reinstall(update: Update, context: ContextTypes.DEFAULT_TYPE, vps_index: int):
     """Handle cancel reinstall"""
@@ -1062,8 +4524,9 @@ async def create_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if len(context.args) < 4:
         await update.message.reply_text(
             f"{format_bold('❌ Invalid Arguments')}\n\n"
-            f"Usage: {format_code('/create <ram> <cpu> <disk> <user_id>')}\n\n"
-            f"Example: {format_code('/create 2 1 20 123456789')}",
+            f"Usage: {format_code('/create <ram> <cpu> <disk> <user_id> [os]')}\n\n"
+            f"Example: {format_code('/create 2 1 20 123456789')}\n\n"
+            f"Systems: {', '.join(format_code(os_key) for os_key in OS_CATALOG)}",
             parse_mode='Markdown'
         )
         return
@@ -1073,44 +4536,25 @@ async def create_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         cpu = int(context.args[1])
         disk = int(context.args[2])
         target_user_id = context.args[3]
+        os_key = context.args[4] if len(context.args) > 4 else DEFAULT_OS
         
         if ram <= 0 or cpu <= 0 or disk <= 0:
             raise ValueError("All values must be positive")
+        if os_key not in OS_CATALOG:
+            raise ValueError(f"Unknown system {os_key}; choose one of {', '.join(OS_CATALOG)}")
         
-        if target_user_id not in bot.vps_data:
-            bot.vps_data[target_user_id] = []
-        
-        vps_count = len(bot.vps_data[target_user_id]) + 1
-        container_name = f"zorvix-instance-{target_user_id}-{vps_count}"
-        ram_mb = ram * 1024
-        
+        spec = plan_spec(ram * 1024, cpu, disk, os_key)
+    except Exception as e:
         await update.message.reply_text(
-            f"{format_bold('⏳ Instance Provisioning')}\n\n"
-            f"Deploying infrastructure...",
+            f"{format_bold('❌ Provisioning Failed')}\n\n"
+            f"Error: {format_code(str(e))}",
             parse_mode='Markdown'
         )
-        
-        await execute_lxc(f"lxc init ubuntu:22.04 {container_name} --storage {DEFAULT_STORAGE_POOL}")
-        await execute_lxc(f"lxc config set {container_name} limits.memory {ram_mb}MB")
-        await execute_lxc(f"lxc config set {container_name} limits.cpu {cpu}")
-        await execute_lxc(f"lxc config device set {container_name} root size {disk}GB")
-        await execute_lxc(f"lxc start {container_name}")
-        
-        config_str = f"{ram}GB RAM / {cpu} Cores / {disk}GB Storage"
-        vps_info = {
-            "container_name": container_name,
-            "ram": f"{ram}GB",
-            "cpu": str(cpu),
-            "storage": f"{disk}GB",
-            "config": config_str,
-            "status": "running",
-            "suspended": False,
-            "suspension_history": [],
-            "created_at": datetime.now().isoformat(),
-            "shared_with": []
-        }
-        bot.vps_data[target_user_id].append(vps_info)
-        save_data()
+        return
+    
+    async def work(job: Job) -> str:
+        container_name, timer = await create_instance(target_user_id, spec, progress=job.report)
+        vps_count = len(bot.vps_data.get(target_user_id, []))
         
         text = f"{format_bold('✅ Instance Provisioned Successfully')}\n\n"
         text += f"{format_section('Owner:', format_code(target_user_id))}\n"
@@ -1119,15 +4563,145 @@ async def create_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text += f"{format_bold('Resource Allocation:')}\n"
         text += f"• RAM: {format_code(f'{ram}GB')}\n"
         text += f"• CPU: {format_code(f'{cpu} Cores')}\n"
-        text += f"• Storage: {format_code(f'{disk}GB')}"
-        
-        await update.message.reply_text(text, parse_mode='Markdown')
-    except Exception as e:
+        text += f"• Storage: {format_code(f'{disk}GB')}\n"
+        text += f"• OS: {format_code(os_name(os_key))}\n\n"
+        text += f"_Provisioned in {timer.total:.1f}s from {timer.source}: {timer.summary()}_"
+        return text
+    
+    message = await update.message.reply_text(
+        f"{format_bold('🕓 Instance Provisioning')}\n\nQueued...",
+        parse_mode='Markdown'
+    )
+    jobs.submit('create', f"Provisioning for {target_user_id}", user_id, work, message,
+                failure_title="Provisioning Failed")
+
+def parse_batch_specs(text: str) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], List[str]]:
+    """Parse `<ram> <cpu> <disk> <user_id> [os]` lines (spaces or commas) into (line, user, spec) items and errors"""
+    items, errors = [], []
+    for line_no, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = next(csv.reader([line])) if ',' in line else line.split()
+        fields = [field.strip() for field in fields]
+        if not items and not errors and fields and all(field.lower() in BATCH_HEADER_FIELDS for field in fields):
+            # CSV header row
+            continue
+        try:
+            if len(fields) not in (4, 5):
+                raise ValueError("expected <ram> <cpu> <disk> <user_id> [os]")
+            if not all(field.isdigit() for field in fields[:3]):
+                raise ValueError("ram, cpu and disk must be whole numbers")
+            ram, cpu, disk = int(fields[0]), int(fields[1]), int(fields[2])
+            if ram <= 0 or cpu <= 0 or disk <= 0:
+                raise ValueError("all values must be positive")
+            if not fields[3].isdigit():
+                raise ValueError(f"invalid user id {fields[3]!r}")
+            os_key = fields[4] if len(fields) == 5 and fields[4] else DEFAULT_OS
+            if os_key not in OS_CATALOG:
+                raise ValueError(f"unknown system {os_key!r}")
+        except ValueError as e:
+            errors.append(f"Line {line_no}: {e}")
+            continue
+        items.append((line_no, fields[3], plan_spec(ram * 1024, cpu, disk, os_key)))
+    return items, errors
+
+async def create_batch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /create_batch command (message text or a CSV document captioned /create_batch)"""
+    user_id = update.effective_user.id
+    if not is_admin(user_id):
         await update.message.reply_text(
-            f"{format_bold('❌ Provisioning Failed')}\n\n"
-            f"Error: {format_code(str(e))}",
+            format_bold("❌ Administrative Privileges Required"),
+            parse_mode='Markdown'
+        )
+        return
+    
+    document = update.message.document
+    if document is not None:
+        if document.file_size and document.file_size > BATCH_MAX_FILE_SIZE:
+            await update.message.reply_text(
+                f"{format_bold('❌ File Too Large')}\n\n"
+                f"Batch files are limited to {format_size(BATCH_MAX_FILE_SIZE)}.",
+                parse_mode='Markdown'
+            )
+            return
+        data = await (await document.get_file()).download_as_bytearray()
+        body = bytes(data).decode('utf-8-sig', errors='replace')
+    else:
+        parts = update.message.text.split(None, 1)
+        body = parts[1] if len(parts) > 1 else ""
+    
+    items, errors = parse_batch_specs(body)
+    if errors or not items:
+        text = f"{format_bold('❌ Invalid Batch')}\n\n"
+        if errors:
+            text += "\n".join(f"• {error}" for error in errors[:20]) + "\n\n"
+        text += f"Usage: {format_code('/create_batch')} followed by one {format_code('<ram> <cpu> <disk> <user_id> [os]')} per line, "
+        text += f"or a CSV file with the caption {format_code('/create_batch')}.\n\n"
+        example = "/create_batch\n2 1 20 123456789\n4 2 40 987654321"
+        text += f"Example:\n{format_code_block(example)}"
+        await update.message.reply_text(truncate_text(text), parse_mode='Markdown')
+        return
+    if len(items) > BATCH_MAX_INSTANCES:
+        await update.message.reply_text(
+            f"{format_bold('❌ Batch Too Large')}\n\n"
+            f"At most {BATCH_MAX_INSTANCES} instances per batch ({len(items)} given).",
             parse_mode='Markdown'
         )
+        return
+    
+    async def work(job: Job) -> str:
+        limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+        results: Dict[int, str] = {}
+        counts = {'running': 0, 'done': 0, 'failed': 0}
+        
+        def report():
+            job.report(
+                f"{counts['done'] + counts['failed']}/{len(items)} finished, "
+                f"{counts['running']} running, {counts['failed']} failed"
+            )
+        
+        async def provision(line_no: int, target_user_id: str, spec: Dict[str, Any]):
+            async with limit:
+                counts['running'] += 1
+                report()
+                started = time.monotonic()
+                try:
+                    container_name, timer = await create_instance(target_user_id, spec)
+                    counts['done'] += 1
+                    results[line_no] = f"✅ {format_code(container_name)} {timer.total:.1f}s from {timer.source}"
+                except Exception as e:
+                    counts['failed'] += 1
+                    elapsed = time.monotonic() - started
+                    results[line_no] = f"❌ line {line_no} ({target_user_id}) after {elapsed:.1f}s: {format_code(str(e))}"
+                finally:
+                    counts['running'] -= 1
+                    report()
+        
+        report()
+        await asyncio.gather(*(provision(*item) for item in items))
+        
+        if not counts['failed']:
+            title = '✅ Batch Provisioning Complete'
+        elif counts['done']:
+            title = '⚠️ Batch Provisioning Partially Complete'
+        else:
+            title = '❌ Batch Provisioning Failed'
+        text = f"{format_bold(title)}\n\n"
+        provisioned = f"{counts['done']}/{len(items)}"
+        text += f"{format_section('Provisioned:', format_code(provisioned))}\n"
+        text += f"{format_section('Failed:', format_code(counts['failed']))}\n"
+        text += f"{format_section('Total Time:', format_code(f'{job.elapsed():.1f}s'))}"
+        # Per-instance results go in follow-up messages so none are cut off
+        job.followups = split_lines([results[line_no] for line_no, _, _ in items])
+        return text
+    
+    message = await update.message.reply_text(
+        f"{format_bold('🕓 Batch Provisioning')}\n\nQueued {len(items)} instances...",
+        parse_mode='Markdown'
+    )
+    jobs.submit('batch', f"Batch Provisioning ({len(items)} instances)", user_id, work, message,
+                failure_title="Batch Provisioning Failed")
 
 async def delete_vps_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /delete_vps command"""
@@ -1163,27 +4737,26 @@ async def delete_vps_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         vps = bot.vps_data[target_user_id][vps_number - 1]
         container_name = vps["container_name"]
         
-        await update.message.reply_text(
-            f"{format_bold('⏳ Initiating Decommission')}\n\n"
+        async def work(job: Job) -> str:
+            job.report("lxc delete")
+            await container_ops.run(container_name, 'delete', lambda: execute_lxc(f"lxc delete {container_name} --force"), wait=True)
+            bot.remove_vps(container_name)
+            save_data()
+            
+            text = f"{format_bold('✅ Instance Decommissioned Successfully')}\n\n"
+            text += f"{format_section('Owner:', format_code(target_user_id))}\n"
+            text += f"{format_section('Instance ID:', format_code(f'#{vps_number}'))}\n"
+            text += f"{format_section('Container:', format_code(container_name))}\n"
+            text += f"{format_section('Reason:', format_code(reason))}"
+            return text
+        
+        message = await update.message.reply_text(
+            f"{format_bold('🕓 Decommission')}\n\n"
             f"Removing Instance #{vps_number}...",
             parse_mode='Markdown'
         )
-        
-        await execute_lxc(f"lxc delete {container_name} --force")
-        del bot.vps_data[target_user_id][vps_number - 1]
-        
-        if not bot.vps_data[target_user_id]:
-            del bot.vps_data[target_user_id]
-        
-        save_data()
-        
-        text = f"{format_bold('✅ Instance Decommissioned Successfully')}\n\n"
-        text += f"{format_section('Owner:', format_code(target_user_id))}\n"
-        text += f"{format_section('Instance ID:', format_code(f'#{vps_number}'))}\n"
-        text += f"{format_section('Container:', format_code(container_name))}\n"
-        text += f"{format_section('Reason:', format_code(reason))}"
-        
-        await update.message.reply_text(text, parse_mode='Markdown')
+        jobs.submit('delete', f"Decommission: {container_name}", user_id, work, message,
+                    failure_title="Decommission Failed")
     except Exception as e:
         await update.message.reply_text(
             f"{format_bold('❌ Decommission Failed')}\n\n"
@@ -1191,6 +4764,23 @@ async def delete_vps_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
             parse_mode='Markdown'
         )
 
+async def jobs_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /jobs command"""
+    in_flight, recent = jobs.visible_to(update.effective_user.id)
+    
+    def line(job: Job) -> str:
+        detail = f" - {format_code(job.progress)}" if job.state == 'running' and job.progress else ""
+        if job.state == 'failed' and job.error:
+            detail = f" - {format_code(truncate_text(job.error, 80))}"
+        return f"{JOB_ICONS[job.state]} {format_code(f'#{job.id}')} {job.title} ({job.elapsed():.0f}s){detail}"
+    
+    text = f"{format_bold('🧾 Background Jobs')}\n\n"
+    text += f"{format_bold('In Flight')}\n"
+    text += "\n".join(line(job) for job in in_flight) if in_flight else "None"
+    text += f"\n\n{format_bold('Recent')}\n"
+    text += "\n".join(line(job) for job in recent[:10]) if recent else "None"
+    await update.message.reply_text(truncate_text(text), parse_mode='Markdown')
+
 async def serverstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /serverstats command"""
     user_id = update.effective_user.id
@@ -1201,27 +4791,16 @@ async def serverstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
     
+    totals = fleet_totals.fleet
     total_users = len(bot.vps_data)
-    total_vps = sum(len(vps_list) for vps_list in bot.vps_data.values())
-    
-    total_ram = 0
-    total_cpu = 0
-    total_storage = 0
-    running_vps = 0
-    suspended_vps = 0
-    
-    for vps_list in bot.vps_data.values():
-        for vps in vps_list:
-            ram_gb = int(vps['ram'].replace('GB', ''))
-            storage_gb = int(vps['storage'].replace('GB', ''))
-            total_ram += ram_gb
-            total_cpu += int(vps['cpu'])
-            total_storage += storage_gb
-            if vps.get('status') == 'running':
-                if vps.get('suspended', False):
-                    suspended_vps += 1
-                else:
-                    running_vps += 1
+    
+    try:
+        await fleet_snapshot.ensure_fresh()
+    except Exception as e:
+        logger.error(f"Error refreshing fleet snapshot: {e}")
+    lxd_running = fleet_snapshot.status_counts.get('Running', 0)
+    lxd_total = len(fleet_snapshot.instances)
+    host = host_sampler.latest()
     
     text = f"{format_bold('📊 Infrastructure Statistics')}\n\n"
     text += f"{format_bold('👥 User Distribution')}\n"
@@ -1229,15 +4808,72 @@ async def serverstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     text += f"• Administrators: {format_code(str(len(bot.admin_data.get('admins', [])) + 1))}\n\n"
     
     text += f"{format_bold('🖥️ Instance Distribution')}\n"
-    text += f"• Total Instances: {format_code(str(total_vps))}\n"
-    text += f"• Operational: {format_code(str(running_vps))}\n"
-    text += f"• Isolated: {format_code(str(suspended_vps))}\n\n"
+    text += f"• Total Instances: {format_code(str(totals.instances))}\n"
+    text += f"• Operational: {format_code(str(totals.running))}\n"
+    text += f"• Isolated: {format_code(str(totals.suspended))}\n"
+    text += f"• LXD Running: {format_code(f'{lxd_running}/{lxd_total}')}\n"
+    text += f"• Warm Pool: {format_code(', '.join(warm_pool.summary()) or 'disabled')} ({warm_pool.hits} hits, {warm_pool.misses} misses)\n"
+    text += f"• Images: {format_code(', '.join(image_cache.summary()))}\n"
+    text += f"• SSH Sessions: {format_code(len(tmate_sessions.sessions))} live ({tmate_sessions.reused} reused, {tmate_sessions.created} started)\n\n"
     
     text += f"{format_bold('📈 Resource Allocation')}\n"
-    text += f"• Total RAM: {format_code(f'{total_ram}GB')}\n"
-    text += f"• Total CPU: {format_code(f'{total_cpu} cores')}\n"
-    text += f"• Total Storage: {format_code(f'{total_storage}GB')}"
+    text += f"• Total RAM: {format_code(f'{totals.ram_mb / 1024:g}GB')}\n"
+    text += f"• Total CPU: {format_code(f'{totals.cpu_cores} cores')}\n"
+    text += f"• Total Storage: {format_code(f'{totals.storage_gb}GB')}"
+    
+    plans = sorted(fleet_totals.by['plan'].items(), key=lambda item: -item[1].instances)[:5]
+    if plans:
+        text += f"\n\n{format_bold('📦 Top Plans')}\n"
+        text += "\n".join(f"• {format_code(plan)}: {plan_totals.instances}" for plan, plan_totals in plans)
+    
+    if host:
+        pressure = " / ".join(
+            f"{host['psi'][resource]:.1f}%" if host['psi'][resource] is not None else "n/a"
+            for resource in ('cpu', 'memory', 'io')
+        )
+        text += f"\n\n{format_bold('🖧 Host')}\n"
+        text += f"• CPU (1 min avg): {format_code(f'{host_sampler.cpu_average(60):.1f}%')}\n"
+        memory = f"{format_size(host['mem_used'])}/{format_size(host['mem_total'])}"
+        text += f"• Memory: {format_code(memory)}\n"
+        text += f"• Load: {format_code(' '.join(f'{v:.2f}' for v in host['load']))}\n"
+        text += f"• Pressure cpu/mem/io: {format_code(pressure)}"
+    
+    stats = persister.stats
+    if stats['flushes']:
+        avg_ms = stats['total_ms'] / stats['flushes']
+        text += f"\n\n{format_bold('💾 Persistence')}\n"
+        text += f"• Flushes: {format_code(str(stats['flushes']))} ({stats['errors']} failed)\n"
+        last = f"{stats['last_ms']:.1f}ms / {format_size(stats['last_bytes'])}"
+        text += f"• Last: {format_code(last)}\n"
+        text += f"• Average: {format_code(f'{avg_ms:.1f}ms')}, total written {format_code(format_size(stats['total_bytes']))}\n"
+        text += f"• Journal: {format_code(str(journal.entries_since_snapshot()))} entries since snapshot, {stats['compactions']} compactions"
+    
+    await update.message.reply_text(text, parse_mode='Markdown')
+
+async def fleet_check_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /fleet_check command"""
+    user_id = update.effective_user.id
+    if not is_admin(user_id):
+        await update.message.reply_text(
+            format_bold("❌ Administrative Privileges Required"),
+            parse_mode='Markdown'
+        )
+        return
+    
+    problems = fleet_totals.drift(bot.vps_data)
+    if not problems:
+        await update.message.reply_text(
+            f"{format_bold('✅ Aggregates Consistent')}\n\n"
+            f"Running totals match a full recount of {format_code(str(fleet_totals.fleet.instances))} instances.",
+            parse_mode='Markdown'
+        )
+        return
     
+    logger.warning(f"Fleet aggregate drift: {problems}")
+    fleet_totals.rebuild(bot.vps_data)
+    text = f"{format_bold('⚠️ Aggregate Drift Detected')}\n\n"
+    text += format_code_block(truncate_text("\n".join(problems), 3500))
+    text += "\n\nTotals have been rebuilt from a full recount."
     await update.message.reply_text(text, parse_mode='Markdown')
 
 async def restart_vps_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1268,15 +4904,10 @@ async def restart_vps_command(update: Update, context: ContextTypes.DEFAULT_TYPE
             parse_mode='Markdown'
         )
         
-        await execute_lxc(f"lxc restart {container_name}")
+        await container_ops.run(container_name, 'restart', lambda: execute_lxc(f"lxc restart {container_name}"))
         
-        for user_id, vps_list in bot.vps_data.items():
-            for vps in vps_list:
-                if vps['container_name'] == container_name:
-                    vps['status'] = 'running'
-                    vps['suspended'] = False
-                    save_data()
-                    break
+        if bot.set_status(container_name, 'running', suspended=False):
+            save_data()
         
         text = f"{format_bold('✅ Restart Completed')}\n\n"
         text += f"Instance {format_code(container_name)} has been successfully restarted."
@@ -1310,50 +4941,41 @@ async def suspend_vps_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     container_name = context.args[0]
     reason = context.args[1] if len(context.args) > 1 else "Administrative action"
     
-    found = False
-    for uid, lst in bot.vps_data.items():
-        for vps in lst:
-            if vps['container_name'] == container_name:
-                if vps.get('status') != 'running':
-                    await update.message.reply_text(
-                        format_bold("❌ Cannot Isolate - Instance must be operational"),
-                        parse_mode='Markdown'
-                    )
-                    return
-                
-                try:
-                    await execute_lxc(f"lxc stop {container_name}")
-                    vps['status'] = 'suspended'
-                    vps['suspended'] = True
-                    if 'suspension_history' not in vps:
-                        vps['suspension_history'] = []
-                    vps['suspension_history'].append({
-                        'time': datetime.now().isoformat(),
-                        'reason': reason,
-                        'by': f"{update.effective_user.name} ({update.effective_user.id})"
-                    })
-                    save_data()
-                    
-                    text = f"{format_bold('✅ Instance Isolated')}\n\n"
-                    text += f"{format_code(container_name)} isolated. Reason: {format_code(reason)}"
-                    await update.message.reply_text(text, parse_mode='Markdown')
-                    found = True
-                except Exception as e:
-                    await update.message.reply_text(
-                        f"{format_bold('❌ Isolation Failed')}\n\n"
-                        f"Error: {format_code(str(e))}",
-                        parse_mode='Markdown'
-                    )
-                    return
-                break
-        if found:
-            break
-    
-    if not found:
+    found = bot.find_vps(container_name)
+    if found is None:
         await update.message.reply_text(
             format_bold("❌ Instance Not Found"),
             parse_mode='Markdown'
         )
+        return
+    
+    _, vps = found
+    if vps.get('status') != 'running':
+        await update.message.reply_text(
+            format_bold("❌ Cannot Isolate - Instance must be operational"),
+            parse_mode='Markdown'
+        )
+        return
+    
+    try:
+        by = f"{update.effective_user.name} ({update.effective_user.id})"
+        
+        async def suspend():
+            await execute_lxc(f"lxc stop {container_name}")
+            bot.suspend_vps(container_name, reason, by)
+        
+        await container_ops.run(container_name, 'suspend', suspend)
+        save_data()
+        
+        text = f"{format_bold('✅ Instance Isolated')}\n\n"
+        text += f"{format_code(container_name)} isolated. Reason: {format_code(reason)}"
+        await update.message.reply_text(text, parse_mode='Markdown')
+    except Exception as e:
+        await update.message.reply_text(
+            f"{format_bold('❌ Isolation Failed')}\n\n"
+            f"Error: {format_code(str(e))}",
+            parse_mode='Markdown'
+        )
 
 async def unsuspend_vps_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /unsuspend_vps command"""
@@ -1376,42 +4998,36 @@ async def unsuspend_vps_command(update: Update, context: ContextTypes.DEFAULT_TY
     
     container_name = context.args[0]
     
-    found = False
-    for uid, lst in bot.vps_data.items():
-        for vps in lst:
-            if vps['container_name'] == container_name:
-                if not vps.get('suspended', False):
-                    await update.message.reply_text(
-                        format_bold("❌ Not Isolated - Instance is not currently isolated"),
-                        parse_mode='Markdown'
-                    )
-                    return
-                
-                try:
-                    vps['suspended'] = False
-                    vps['status'] = 'running'
-                    await execute_lxc(f"lxc start {container_name}")
-                    save_data()
-                    
-                    text = f"{format_bold('✅ Isolation Removed')}\n\n"
-                    text += f"Instance {format_code(container_name)} reinstated and powered on."
-                    await update.message.reply_text(text, parse_mode='Markdown')
-                    found = True
-                except Exception as e:
-                    await update.message.reply_text(
-                        f"{format_bold('❌ Reinstatement Failed')}\n\n"
-                        f"Error: {format_code(str(e))}",
-                        parse_mode='Markdown'
-                    )
-                break
-        if found:
-            break
-    
-    if not found:
+    found = bot.find_vps(container_name)
+    if found is None:
         await update.message.reply_text(
             format_bold("❌ Instance Not Found"),
             parse_mode='Markdown'
         )
+        return
+    
+    _, vps = found
+    if not vps.get('suspended', False):
+        await update.message.reply_text(
+            format_bold("❌ Not Isolated - Instance is not currently isolated"),
+            parse_mode='Markdown'
+        )
+        return
+    
+    try:
+        await container_ops.run(container_name, 'unsuspend', lambda: execute_lxc(f"lxc start {container_name}"))
+        bot.unsuspend_vps(container_name)
+        save_data()
+        
+        text = f"{format_bold('✅ Isolation Removed')}\n\n"
+        text += f"Instance {format_code(container_name)} reinstated and powered on."
+        await update.message.reply_text(text, parse_mode='Markdown')
+    except Exception as e:
+        await update.message.reply_text(
+            f"{format_bold('❌ Reinstatement Failed')}\n\n"
+            f"Error: {format_code(str(e))}",
+            parse_mode='Markdown'
+        )
 
 # ============================================================================
 # MAIN ADMIN COMMANDS
@@ -1452,10 +5068,7 @@ async def admin_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    if "admins" not in bot.admin_data:
-        bot.admin_data["admins"] = []
-    
-    bot.admin_data["admins"].append(target_user_id)
+    bot.add_admin(target_user_id)
     save_data()
     
     text = f"{format_bold('✅ Administrator Added')}\n\n"
@@ -1497,7 +5110,7 @@ async def admin_remove_command(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         return
     
-    bot.admin_data["admins"].remove(target_user_id)
+    bot.remove_admin(target_user_id)
     save_data()
     
     text = f"{format_bold('✅ Administrator Removed')}\n\n"
@@ -1557,10 +5170,13 @@ async def post_init(application: Application):
         BotCommand("uptime", "Display host uptime"),
         BotCommand("myvps", "List your instances"),
         BotCommand("manage", "Access control panel"),
+        BotCommand("jobs", "Show background jobs"),
         BotCommand("help", "Show command documentation"),
         BotCommand("create", "Provision new instance (Admin)"),
+        BotCommand("create_batch", "Provision many instances (Admin)"),
         BotCommand("delete_vps", "Decommission instance (Admin)"),
         BotCommand("serverstats", "Show infrastructure stats (Admin)"),
+        BotCommand("fleet_check", "Verify fleet totals (Admin)"),
         BotCommand("restart_vps", "Restart instance (Admin)"),
         BotCommand("suspend_vps", "Isolate instance (Admin)"),
         BotCommand("unsuspend_vps", "Remove isolation (Admin)"),
@@ -1570,6 +5186,15 @@ async def post_init(application: Application):
     ]
     
     await application.bot.set_my_commands(commands, scope=BotCommandScopeAllPrivateChats())
+    
+    # Finish or undo creates and reinstalls interrupted by the last shutdown
+    if provisioning_ledger.entries:
+        jobs.submit('recover', "Provisioning Recovery", MAIN_ADMIN_ID, recover_provisioning)
+
+async def post_shutdown(application: Application):
+    """Post-shutdown: write pending state and release pooled LXD connections"""
+    await persister.flush(compact=True)
+    await lxd.close()
 
 def main():
     """Main function"""
@@ -1584,11 +5209,11 @@ def main():
         return
     
     # Load data
-    bot.vps_data = load_vps_data()
-    bot.admin_data = load_admin_data()
+    load_state()
+    provisioning_ledger.load()
     
     # Create application
-    application = Application.builder().token(TELEGRAM_TOKEN).post_init(post_init).build()
+    application = Application.builder().token(TELEGRAM_TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
     
     # Register command handlers
     application.add_handler(CommandHandler("start", start_command))
@@ -1596,10 +5221,16 @@ def main():
     application.add_handler(CommandHandler("uptime", uptime_command))
     application.add_handler(CommandHandler("myvps", myvps_command))
     application.add_handler(CommandHandler("manage", manage_command))
+    application.add_handler(CommandHandler("jobs", jobs_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("create", create_command))
+    application.add_handler(CommandHandler("create_batch", create_batch_command))
+    application.add_handler(MessageHandler(
+        filters.Document.ALL & filters.CaptionRegex(r'^/create_batch(@\w+)?(\s|$)'), create_batch_command
+    ))
     application.add_handler(CommandHandler("delete_vps", delete_vps_command))
     application.add_handler(CommandHandler("serverstats", serverstats_command))
+    application.add_handler(CommandHandler("fleet_check", fleet_check_command))
     application.add_handler(CommandHandler("restart_vps", restart_vps_command))
     application.add_handler(CommandHandler("suspend_vps", suspend_vps_command))
     application.add_handler(CommandHandler("unsuspend_vps", unsuspend_vps_command))
@@ -1613,9 +5244,33 @@ def main():
     # Register error handler
     application.add_error_handler(error_handler)
     
-    # Start CPU monitoring thread
-    cpu_thread = threading.Thread(target=cpu_monitor, daemon=True)
-    cpu_thread.start()
+    # Start write-behind persistence
+    application.job_queue.run_once(lambda ctx: ctx.application.create_task(persister.run()), 0)
+    
+    # Start background job workers
+    application.job_queue.run_once(lambda ctx: ctx.application.create_task(jobs.run()), 0)
+    
+    # Start image cache refresh
+    application.job_queue.run_once(lambda ctx: ctx.application.create_task(image_cache.run()), 0)
+    
+    # Start tmate session reaper
+    application.job_queue.run_once(lambda ctx: ctx.application.create_task(tmate_sessions.run()), 1)
+    
+    # Start warm pool maintenance
+    application.job_queue.run_once(lambda ctx: ctx.application.create_task(warm_pool.run()), 0)
+    
+    # Start host sampler
+    application.job_queue.run_once(lambda ctx: ctx.application.create_task(host_sampler_loop()), 1)
+    
+    # Start host CPU watchdog
+    application.job_queue.run_once(lambda ctx: ctx.application.create_task(cpu_monitor()), 1)
+    
+    # Start LXD operation event listener
+    if lxd.available():
+        application.job_queue.run_once(lambda ctx: ctx.application.create_task(lxd.watch_operations()), 1)
+    
+    # Start lifecycle event watcher
+    application.job_queue.run_once(lambda ctx: ctx.application.create_task(lifecycle_watcher.run()), 1)
     
     # Start VPS monitoring task
     application.job_queue.run_once(lambda ctx: ctx.application.create_task(vps_monitor()), 1)